@@ -0,0 +1,175 @@
+"""Batch window computation offloaded to a process pool.
+
+Rescheduling sweeps evaluate ``find_windows`` for many (task, forecast)
+pairs. Running them in the request threadpool holds the GIL and stalls
+interactive requests, so this module partitions the work into chunks and
+ships each chunk to a ``ProcessPoolExecutor`` in a compact tuple form: every
+forecast referenced by a chunk is sent once as rows of
+``(dt, temp, rain, humidity)`` and every task as its constraint tuple.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import multiprocessing
+import os
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from . import find_windows
+
+Block = find_windows.Block
+ForecastRows = Tuple[Tuple[object, ...], ...]
+
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", "500"))
+
+_BLOCK_FIELDS = ("dt", "temp", "rain", "humidity")
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    """One task to evaluate against the forecast stored under ``forecast_key``."""
+
+    task_id: int
+    forecast_key: str
+    constraints: Tuple[object, ...]
+
+    @classmethod
+    def from_task(cls, task: object, forecast_key: str) -> "WorkUnit":
+        return cls(
+            task_id=getattr(task, "id"),
+            forecast_key=forecast_key,
+            constraints=find_windows.constraint_fingerprint(task),
+        )
+
+
+def _pack_forecast(forecast: List[Block], timezone_offset: int) -> Tuple[int, ForecastRows]:
+    rows = tuple(tuple(block.get(field) for field in _BLOCK_FIELDS) for block in forecast)
+    return timezone_offset, rows
+
+
+def _unpack_forecast(rows: ForecastRows) -> List[Block]:
+    return [dict(zip(_BLOCK_FIELDS, row)) for row in rows]
+
+
+def _evaluate(
+    forecast: List[Block], timezone_offset: int, constraints: Tuple[object, ...]
+) -> Dict[str, object]:
+    # Compiled predicates are cached per fingerprint in each worker process.
+    compiled = find_windows.compile_constraints(constraints)
+    return find_windows.scan_windows(forecast, compiled, timezone_offset)
+
+
+def _run_chunk(
+    forecasts: Mapping[str, Tuple[int, ForecastRows]],
+    units: Sequence[Tuple[int, str, Tuple[object, ...]]],
+) -> List[Tuple[int, Dict[str, object]]]:
+    """Worker entry point: evaluate one chunk of packed work units."""
+    unpacked = {key: (_unpack_forecast(rows), offset) for key, (offset, rows) in forecasts.items()}
+    results = []
+    for task_id, key, constraints in units:
+        forecast, offset = unpacked[key]
+        results.append((task_id, _evaluate(forecast, offset, constraints)))
+    return results
+
+
+def _partition(units: Sequence[WorkUnit], chunk_size: int) -> Iterable[List[WorkUnit]]:
+    # Keep units that share a forecast adjacent so each chunk carries few forecasts.
+    ordered = sorted(units, key=lambda unit: unit.forecast_key)
+    for start in range(0, len(ordered), chunk_size):
+        yield ordered[start:start + chunk_size]
+
+
+# One pool per worker count, so callers asking for different sizes never
+# shut down a pool another thread is still waiting on.
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> Executor:
+    with _executor_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            # ``spawn`` keeps workers independent of the threads (and open
+            # database connections) of the web process that starts them.
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _executors[max_workers] = executor
+        return executor
+
+
+def _discard_executor(max_workers: int, executor: Executor) -> None:
+    with _executor_lock:
+        if _executors.get(max_workers) is executor:
+            del _executors[max_workers]
+    executor.shutdown(wait=False)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes, if any were started."""
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+
+def _run_in_pool(
+    workers: int,
+    chunks: List[List[WorkUnit]],
+    packed: Mapping[str, Tuple[int, ForecastRows]],
+) -> Dict[int, Dict[str, object]]:
+    executor = _get_executor(workers)
+    try:
+        futures = [
+            executor.submit(
+                _run_chunk,
+                {key: packed[key] for key in {unit.forecast_key for unit in chunk}},
+                [(unit.task_id, unit.forecast_key, unit.constraints) for unit in chunk],
+            )
+            for chunk in chunks
+        ]
+        results: Dict[int, Dict[str, object]] = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+    except BrokenProcessPool:
+        _discard_executor(workers, executor)
+        raise
+
+
+def compute_windows_batch(
+    units: Sequence[WorkUnit],
+    forecasts: Mapping[str, Tuple[List[Block], int]],
+    *,
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[int, Dict[str, object]]:
+    """Run ``find_windows`` for every unit and return results by task id.
+
+    ``forecasts`` maps each ``forecast_key`` to ``(blocks, timezone_offset)``.
+    Batches that fit in a single chunk, or ``max_workers <= 1``, are evaluated
+    in the calling thread since shipping them to a worker would cost more
+    than it saves.
+    """
+    workers = BATCH_MAX_WORKERS if max_workers is None else max_workers
+    size = max(1, BATCH_CHUNK_SIZE if chunk_size is None else chunk_size)
+    if not units:
+        return {}
+    if workers <= 1 or len(units) <= size:
+        return {
+            unit.task_id: _evaluate(
+                forecasts[unit.forecast_key][0], forecasts[unit.forecast_key][1], unit.constraints
+            )
+            for unit in units
+        }
+
+    packed = {key: _pack_forecast(blocks, offset) for key, (blocks, offset) in forecasts.items()}
+    chunks = list(_partition(units, size))
+    try:
+        return _run_in_pool(workers, chunks, packed)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); retry once on a fresh pool.
+        return _run_in_pool(workers, chunks, packed)
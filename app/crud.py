@@ -1,10 +1,57 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from itertools import groupby
+from operator import attrgetter
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import uuid
 
 from fastapi import HTTPException
+from sqlalchemy import DateTime, Row, and_, bindparam, func, or_, select, update
 from sqlalchemy.orm import Session
 
-from . import find_windows, models, schemas, weather
+from . import events, find_windows, metrics, models, schemas, shared_cache, weather
+
+
+# Monotonic counter bumped after every committed task mutation. The epoch keeps
+# versions from a previous process lifetime from matching current ones. With
+# SHARED_CACHE_DIR set the counter lives in shared memory so every worker
+# observes mutations made by the others.
+_table_epoch = uuid.uuid4().hex[:8]
+_table_version = 0
+_table_version_lock = threading.Lock()
+_shared_version: Optional[shared_cache.SharedCounter] = None
+_shared_version_checked = False
+
+
+def _shared_table_version() -> Optional[shared_cache.SharedCounter]:
+    global _shared_version, _shared_version_checked
+    if not _shared_version_checked:
+        with _table_version_lock:
+            if not _shared_version_checked:
+                directory = shared_cache.shared_cache_dir()
+                if directory is not None:
+                    _shared_version = shared_cache.SharedCounter(directory / "tasks.version")
+                _shared_version_checked = True
+    return _shared_version
+
+
+def get_table_version() -> str:
+    """Return an opaque identifier for the current state of the tasks table."""
+    shared = _shared_table_version()
+    if shared is not None:
+        return shared.value()
+    return f"{_table_epoch}.{_table_version}"
+
+
+def _bump_table_version() -> None:
+    global _table_version
+    shared = _shared_table_version()
+    if shared is not None:
+        shared.increment()
+        return
+    with _table_version_lock:
+        _table_version += 1
 
 
 def _build_task_response(
@@ -18,12 +65,100 @@ def _build_task_response(
         reason_details=window_result.get("reason_details", []),
     )
 
+location_key_for = weather.location_key_for
+
+
+# Columns needed to (re)compute a schedule; fetched as plain rows rather than
+# ORM objects so large sweeps avoid identity-map and attribute overhead.
+SCHEDULE_COLUMNS = (
+    models.Task.id,
+    models.Task.location_key,
+    models.Task.min_temp,
+    models.Task.max_temp,
+    models.Task.min_humidity,
+    models.Task.max_humidity,
+    models.Task.no_rain,
+    models.Task.duration_hours,
+    models.Task.earliest_start,
+    models.Task.latest_start,
+    models.Task.scheduled_time,
+)
+
+
+def iter_task_groups(
+    db: Session, *, batch_size: int = 1000
+) -> Iterator[Tuple[str, List[Row]]]:
+    """Yield schedule rows grouped by ``location_key``, in key order.
+
+    Rows are read in keyset-paginated pages of ``batch_size`` and each page is
+    fully fetched before any group is yielded, so no cursor (and on SQLite no
+    shared lock) stays open while the caller works on a group, e.g. fetching
+    its forecast.
+    """
+    base = (
+        select(*SCHEDULE_COLUMNS)
+        .where(models.Task.location_key.is_not(None))
+        .order_by(models.Task.location_key, models.Task.id)
+        .limit(batch_size)
+    )
+    pending_key: Optional[str] = None
+    pending: List[Row] = []
+    last: Optional[Tuple[str, int]] = None
+    while True:
+        stmt = base
+        if last is not None:
+            stmt = stmt.where(
+                or_(
+                    models.Task.location_key > last[0],
+                    and_(models.Task.location_key == last[0], models.Task.id > last[1]),
+                )
+            )
+        page = db.execute(stmt).all()
+        if not page:
+            break
+        last = (page[-1].location_key, page[-1].id)
+        for key, rows in groupby(page, key=attrgetter("location_key")):
+            if key != pending_key:
+                if pending:
+                    yield pending_key, pending
+                pending_key, pending = key, []
+            pending.extend(rows)
+        if len(page) < batch_size:
+            break
+    if pending:
+        yield pending_key, pending
+
+
+def get_tasks_at_location(db: Session, location: str) -> List[Row]:
+    key = location_key_for(location)
+    if key is None:
+        return []
+    stmt = (
+        select(*SCHEDULE_COLUMNS)
+        .where(models.Task.location_key == key)
+        .order_by(models.Task.id)
+    )
+    return list(db.execute(stmt))
+
+
+def get_tasks_scheduled_before(db: Session, cutoff: datetime) -> List[Row]:
+    stmt = (
+        select(*SCHEDULE_COLUMNS)
+        .where(models.Task.scheduled_time < cutoff)
+        .order_by(models.Task.scheduled_time, models.Task.id)
+    )
+    return list(db.execute(stmt))
+
+
 def get_task(db: Session, task_id: int):
     return db.query(models.Task).filter(models.Task.id == task_id).first()
 
 def get_tasks(db: Session):
     return db.query(models.Task).all()
 
+def count_tasks(db: Session) -> int:
+    return db.query(func.count(models.Task.id)).scalar() or 0
+
 def create_task(db: Session, task: schemas.TaskCreate) -> schemas.TaskMutationResponse:
     # Fetch forecast and find scheduling window
     try:
@@ -33,18 +168,7 @@ def create_task(db: Session, task: schemas.TaskCreate) -> schemas.TaskMutationRe
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    window_result = find_windows.find_windows(
-        forecast=forecast,
-        min_temp=task.min_temp,
-        max_temp=task.max_temp,
-        min_humidity=getattr(task, 'min_humidity', None),
-        max_humidity=getattr(task, 'max_humidity', None),
-        no_rain=bool(task.no_rain),
-        duration_hours=task.duration_hours,
-        earliest_start=getattr(task, 'earliest_start', None),
-        latest_start=getattr(task, 'latest_start', None),
-        timezone_offset=timezone_offset,
-    )
+    window_result = find_windows.find_windows_for_task(forecast, task, timezone_offset)
     windows = window_result['windows']
     scheduled_time = None
     if windows:
@@ -59,6 +183,7 @@ def create_task(db: Session, task: schemas.TaskCreate) -> schemas.TaskMutationRe
         max_humidity=getattr(task, 'max_humidity', None),
         no_rain=bool(task.no_rain),
         location=task.location,
+        location_key=location_key_for(task.location),
         created_at=datetime.utcnow(),
         scheduled_time=scheduled_time,
         earliest_start=getattr(task, 'earliest_start', None),
@@ -66,14 +191,19 @@ def create_task(db: Session, task: schemas.TaskCreate) -> schemas.TaskMutationRe
     )
     db.add(db_task)
     db.commit()
+    _bump_table_version()
     db.refresh(db_task)
-    return _build_task_response(db_task, window_result)
+    response = _build_task_response(db_task, window_result)
+    events.publish_task(events.TASK_CREATED, response.task)
+    return response
 
 def delete_task(db: Session, task_id: int):
     task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if task:
         db.delete(task)
         db.commit()
+        _bump_table_version()
+        events.publish_task_deleted(task_id)
         return True
     return False
 
@@ -87,6 +217,7 @@ def update_task(
     update_data.pop('scheduled_time', None)
     for field, value in update_data.items():
         setattr(task, field, value)
+    task.location_key = location_key_for(task.location)
     try:
         forecast, timezone_offset = weather.fetch_hourly_forecast(task.location)
     except weather.WeatherServiceError as e:
@@ -94,22 +225,140 @@ def update_task(
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    window_result = find_windows.find_windows(
-        forecast=forecast,
-        min_temp=task.min_temp,
-        max_temp=task.max_temp,
-        min_humidity=task.min_humidity,
-        max_humidity=task.max_humidity,
-        no_rain=bool(task.no_rain),
-        duration_hours=task.duration_hours,
-        earliest_start=task.earliest_start,
-        latest_start=task.latest_start,
-        timezone_offset=timezone_offset,
-    )
+    window_result = find_windows.find_windows_for_task(forecast, task, timezone_offset)
     windows = window_result['windows']
     task.scheduled_time = (
         datetime.utcfromtimestamp(windows[0]['start_ts']) if windows else None
     )
     db.commit()
+    _bump_table_version()
     db.refresh(task)
-    return _build_task_response(task, window_result)
+    response = _build_task_response(task, window_result)
+    events.publish_task(events.TASK_UPDATED, response.task)
+    return response
+
+
+_tasks = models.Task.__table__
+
+# Guarded on the value the caller read, so a row deleted or re-edited since
+# (e.g. by ``update_task``) is left alone instead of being overwritten.
+_GUARDED_SCHEDULE_UPDATE = (
+    update(_tasks)
+    .where(
+        _tasks.c.id == bindparam("task_id"),
+        _tasks.c.scheduled_time.is_not_distinct_from(bindparam("expected", type_=DateTime)),
+    )
+    .values(scheduled_time=bindparam("new_time", type_=DateTime))
+)
+_CONFIRM_CHUNK = 500
+
+
+class ScheduledTimeWriter:
+    """Collect ``scheduled_time`` changes and write them in bulk.
+
+    Each change carries the ``scheduled_time`` it was computed from. A flush
+    is a single executemany UPDATE in its own transaction that only touches
+    rows still holding that value; rows deleted or changed in the meantime
+    are counted in ``rows_skipped`` and left as they are. On error the
+    transaction is rolled back, the changes stay pending and the exception
+    propagates. A flush happens automatically once ``batch_size`` changes
+    are pending or ``flush_interval`` seconds have passed since the last
+    one; ``None`` disables either trigger. Use as a context manager to
+    flush on exit.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        *,
+        batch_size: Optional[int] = 5000,
+        flush_interval: Optional[float] = None,
+        publish_events: bool = True,
+    ) -> None:
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.publish_events = publish_events
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.flushes = 0
+        self._pending: Dict[int, Tuple[Optional[datetime], Optional[datetime]]] = {}
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self, task_id: int, scheduled_time: Optional[datetime], expected: Optional[datetime]
+    ) -> None:
+        """Queue ``scheduled_time`` for a task whose current value is ``expected``."""
+        self._pending[task_id] = (scheduled_time, expected)
+        if self.batch_size is not None and len(self._pending) >= self.batch_size:
+            self.flush()
+        elif (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def _confirm(
+        self, changes: Dict[int, Tuple[Optional[datetime], Optional[datetime]]]
+    ) -> Dict[int, Optional[datetime]]:
+        # The executemany rowcount is a total; re-read inside the same
+        # transaction to learn which rows actually took the new value.
+        written: Dict[int, Optional[datetime]] = {}
+        task_ids = list(changes)
+        for start in range(0, len(task_ids), _CONFIRM_CHUNK):
+            stmt = select(_tasks.c.id, _tasks.c.scheduled_time).where(
+                _tasks.c.id.in_(task_ids[start:start + _CONFIRM_CHUNK])
+            )
+            for task_id, value in self.db.execute(stmt):
+                if value == changes[task_id][0]:
+                    written[task_id] = value
+        return written
+
+    def flush(self) -> int:
+        """Write all pending changes; return the number of rows written."""
+        if not self._pending:
+            return 0
+        changes = self._pending
+        started = time.perf_counter()
+        try:
+            self.db.execute(
+                _GUARDED_SCHEDULE_UPDATE,
+                [
+                    {"task_id": task_id, "new_time": value, "expected": expected}
+                    for task_id, (value, expected) in changes.items()
+                ],
+            )
+            written = self._confirm(changes)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            metrics.registry.increment("scheduled_writer.failures")
+            raise
+        elapsed = time.perf_counter() - started
+        skipped = len(changes) - len(written)
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self.rows_written += len(written)
+        self.rows_skipped += skipped
+        self.flushes += 1
+        metrics.registry.increment("scheduled_writer.flushes")
+        metrics.registry.increment("scheduled_writer.rows", len(written))
+        metrics.registry.increment("scheduled_writer.skipped", skipped)
+        metrics.registry.observe("scheduled_writer.flush_seconds", elapsed)
+        if written:
+            _bump_table_version()
+        if self.publish_events:
+            for task_id, value in written.items():
+                events.publish_task_scheduled(task_id, value)
+        return len(written)
+
+    def __enter__(self) -> "ScheduledTimeWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,103 @@
+"""Database engine and session factory, created on first use."""
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy import bindparam, create_engine, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from . import models, weather
+
+DATABASE_URL = "sqlite:///./test.db"
+
+# Set to ``0`` when schema creation is left to ``scripts/init_db.py``.
+AUTO_CREATE_SCHEMA = os.environ.get("AUTO_CREATE_SCHEMA", "1") != "0"
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    return _engine
+
+
+class _LazySessionmaker(sessionmaker):
+    """``sessionmaker`` that binds to the engine the first time it is called."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _upgrade_tasks_table(engine: Engine) -> None:
+    """Bring a ``tasks`` table created by an older release up to date.
+
+    ``create_all`` only creates missing tables, so columns and indexes added
+    later are applied here, and ``location_key`` is backfilled for old rows.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("tasks")}
+    table = models.Task.__table__
+    with engine.begin() as conn:
+        if "location_key" not in columns:
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN location_key VARCHAR"))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+        missing = conn.execute(
+            select(table.c.id, table.c.location).where(table.c.location_key.is_(None))
+        ).all()
+        updates = [
+            {"row_id": row.id, "key": weather.location_key_for(row.location)}
+            for row in missing
+        ]
+        updates = [params for params in updates if params["key"] is not None]
+        if updates:
+            conn.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(location_key=bindparam("key")),
+                updates,
+            )
+
+
+def _upgrade_jobs_table(engine: Engine) -> None:
+    """Add columns introduced after the ``jobs`` table was first created."""
+    columns = {column["name"] for column in inspect(engine).get_columns("jobs")}
+    with engine.begin() as conn:
+        if "worker" not in columns:
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN worker VARCHAR"))
+        if "heartbeat_at" not in columns:
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at DATETIME"))
+
+
+def init_schema() -> None:
+    """Create missing tables and apply upgrades once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            engine = get_engine()
+            models.Base.metadata.create_all(bind=engine)
+            _upgrade_tasks_table(engine)
+            _upgrade_jobs_table(engine)
+            _schema_ready = True
@@ -0,0 +1,304 @@
+"""Fan-out of task change events to Server-Sent Events clients.
+
+Events are numbered per *epoch* and sent with ``<epoch>-<number>`` ids. By
+default the epoch and the numbering belong to this process. With
+``SHARED_CACHE_DIR`` set, every worker appends its events to a shared
+:class:`shared_cache.SharedEventLog` and tails it, so all workers deliver
+every event under the same ids and a client may reconnect to any of them.
+An id from another epoch cannot be resumed and gets a ``resync``.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+import uuid
+
+from . import schemas, shared_cache
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+TASK_SCHEDULED = "task.scheduled"
+RESYNC = "resync"
+
+KEEPALIVE_SECONDS = 15.0
+RETRY_MILLISECONDS = 3000
+# How often a worker tails the shared event log for other workers' events.
+SHARED_POLL_SECONDS = 0.2
+
+
+@dataclass(frozen=True)
+class TaskEvent:
+    """A single change notification, pre-encoded once for every subscriber."""
+
+    id: int
+    type: str
+    data: Dict[str, Any]
+    payload: bytes
+
+
+# Queued only to wake a waiting stream; never sent.
+_WAKE = TaskEvent(id=0, type=RESYNC, data={}, payload=b"")
+
+
+def _encode(event_id: Optional[str], event_type: str, data: Dict[str, Any]) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscription:
+    """A bounded per-client queue fed by :class:`TaskEventBroker`."""
+
+    def __init__(
+        self,
+        broker: "TaskEventBroker",
+        loop: asyncio.AbstractEventLoop,
+        *,
+        max_queue: int,
+        backlog: List[TaskEvent],
+        needs_resync: bool,
+    ) -> None:
+        self._broker = broker
+        self._loop = loop
+        self._queue: "asyncio.Queue[TaskEvent]" = asyncio.Queue(maxsize=max_queue)
+        self._backlog = backlog
+        self._needs_resync = needs_resync
+
+    def _deliver(self, event: TaskEvent) -> None:
+        # Runs on the subscriber's event loop. A client that cannot keep up is
+        # told to resync instead of buffering an unbounded backlog for it.
+        if self._needs_resync:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._needs_resync = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def _mark_resync(self) -> None:
+        self._needs_resync = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        # Wake the stream so the resync goes out now, not after a keepalive.
+        self._queue.put_nowait(_WAKE)
+
+    def _request_resync(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._mark_resync)
+        except RuntimeError:
+            pass
+
+    def _schedule(self, event: TaskEvent) -> bool:
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:
+            # The subscriber's loop has shut down; drop the subscription.
+            return False
+        return True
+
+    async def stream(self, keepalive: float = KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+        """Yield encoded SSE frames, emitting comments while idle."""
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode("utf-8")
+        for event in self._backlog:
+            yield event.payload
+        self._backlog = []
+        while True:
+            if self._needs_resync:
+                self._needs_resync = False
+                yield _encode(self._broker.format_id(self._broker.last_event_id), RESYNC, {})
+                continue
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if self._needs_resync:
+                continue
+            yield event.payload
+
+    def close(self) -> None:
+        self._broker._unsubscribe(self)
+
+
+class TaskEventBroker:
+    """Thread-safe publisher that fans task deltas out to SSE subscribers.
+
+    Publishing happens from the request threadpool, so each event is encoded
+    once and handed to subscriber loops with ``call_soon_threadsafe``. A short
+    history lets reconnecting clients replay what they missed via
+    ``Last-Event-ID``; anything older, or from another epoch, triggers a
+    ``resync`` event instead.
+
+    With a shared ``log`` events are appended to it rather than delivered
+    directly, and a background thread delivers whatever any worker appended.
+    """
+
+    def __init__(
+        self,
+        *,
+        history_size: int = 256,
+        max_queue: int = 256,
+        log: Optional[shared_cache.SharedEventLog] = None,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._history: Deque[TaskEvent] = deque(maxlen=history_size)
+        self._subscribers: List[Subscription] = []
+        self._max_queue = max_queue
+        self._last_id = 0
+        self._log = log
+        self.epoch = log.epoch if log is not None else uuid.uuid4().hex[:8]
+        self._reader = log.reader() if log is not None else None
+        self._reader_lock = threading.Lock()
+        self._tailer: Optional[threading.Thread] = None
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def format_id(self, number: int) -> str:
+        return f"{self.epoch}-{number}"
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        if self._log is None:
+            with self._lock:
+                self._dispatch(self._last_id + 1, event_type, data)
+            return
+        self._log.append({"type": event_type, "data": data})
+        # Deliver right away rather than on the tailer's next poll.
+        self.poll_shared_log()
+
+    def _dispatch(self, number: int, event_type: str, data: Dict[str, Any]) -> None:
+        # Called with ``_lock`` held.
+        if self._last_id and number != self._last_id + 1:
+            # Records were missed (the log rotated past us); nobody can
+            # replay across the gap.
+            self._history.clear()
+            for sub in self._subscribers:
+                sub._request_resync()
+        self._last_id = number
+        event = TaskEvent(
+            id=number,
+            type=event_type,
+            data=data,
+            payload=_encode(self.format_id(number), event_type, data),
+        )
+        self._history.append(event)
+        stale = [sub for sub in self._subscribers if not sub._schedule(event)]
+        for sub in stale:
+            self._subscribers.remove(sub)
+
+    def poll_shared_log(self) -> None:
+        """Deliver records other workers appended to the shared log."""
+        if self._reader is None:
+            return
+        with self._reader_lock:
+            records = self._reader.read()
+            with self._lock:
+                for record in records:
+                    try:
+                        self._dispatch(int(record["seq"]), str(record["type"]), record["data"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+
+    def _tail(self) -> None:
+        while True:
+            time.sleep(SHARED_POLL_SECONDS)
+            self.poll_shared_log()
+
+    def _ensure_tailer(self) -> None:
+        if self._reader is None or self._tailer is not None:
+            return
+        with self._reader_lock:
+            if self._tailer is None:
+                self._tailer = threading.Thread(target=self._tail, name="event-log-tailer", daemon=True)
+                self._tailer.start()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Register a subscriber on the running event loop."""
+        loop = asyncio.get_running_loop()
+        self._ensure_tailer()
+        self.poll_shared_log()
+        with self._lock:
+            backlog: List[TaskEvent] = []
+            needs_resync = False
+            if last_event_id:
+                parsed = _parse_event_id(last_event_id)
+                if parsed is None or parsed[0] != self.epoch or parsed[1] > self._last_id:
+                    # Ids from another process, an earlier shared log or an
+                    # unknown format cannot be resumed.
+                    needs_resync = True
+                elif parsed[1] < self._last_id:
+                    resume_from = parsed[1]
+                    backlog = [event for event in self._history if event.id > resume_from]
+                    oldest = self._history[0].id if self._history else self._last_id + 1
+                    if oldest > resume_from + 1:
+                        backlog = []
+                        needs_resync = True
+            subscription = Subscription(
+                self,
+                loop,
+                max_queue=self._max_queue,
+                backlog=backlog,
+                needs_resync=needs_resync,
+            )
+            self._subscribers.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            try:
+                self._subscribers.remove(subscription)
+            except ValueError:
+                pass
+
+
+def _parse_event_id(value: str) -> Optional[Tuple[str, int]]:
+    epoch, _, number = value.strip().rpartition("-")
+    try:
+        return epoch, int(number)
+    except ValueError:
+        return None
+
+
+def _shared_log() -> Optional[shared_cache.SharedEventLog]:
+    directory = shared_cache.shared_cache_dir()
+    if directory is None:
+        return None
+    return shared_cache.SharedEventLog(directory / "events" / "tasks.log")
+
+
+broker = TaskEventBroker(log=_shared_log())
+
+
+def publish_task(event_type: str, task: schemas.Task) -> None:
+    """Publish a full task snapshot for create/update events."""
+    broker.publish(event_type, {"task": task.model_dump(mode="json")})
+
+
+def publish_task_deleted(task_id: int) -> None:
+    broker.publish(TASK_DELETED, {"id": task_id})
+
+
+def publish_task_scheduled(task_id: int, scheduled_time: Optional[datetime]) -> None:
+    """Publish a minimal delta for a ``scheduled_time`` change."""
+    broker.publish(
+        TASK_SCHEDULED,
+        {
+            "id": task_id,
+            "scheduled_time": scheduled_time.isoformat() if scheduled_time else None,
+        },
+    )
@@ -1,15 +1,57 @@
-from collections import Counter
+from collections import Counter, OrderedDict
+from functools import lru_cache
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 Block = Dict[str, float]
 
+SECONDS_PER_DAY = 86400
+
 
 def _to_timezone_struct(timestamp: int, timezone_offset: int) -> time.struct_time:
     """Convert a UTC timestamp to the task's local time using the offset."""
     return time.gmtime(timestamp + timezone_offset)
 
 
+def _local_minute_of_day(timestamp: int, timezone_offset: int) -> int:
+    """Minutes since local midnight; matches ``_to_timezone_struct`` hour/min."""
+    return (int(timestamp + timezone_offset) % SECONDS_PER_DAY) // 60
+
+
+def _format_minute_of_day(minute: int) -> str:
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+# Recently used local-time tables keyed by the forecast's timestamps and offset,
+# so batches of tasks sharing a forecast derive the table once. Only the table
+# is kept, never the forecast list itself.
+_LOCAL_TABLE_SLOTS = 32
+_local_tables: "OrderedDict[Tuple[int, Tuple[int, ...]], List[int]]" = OrderedDict()
+_local_tables_lock = threading.Lock()
+
+
+def local_minutes_table(forecast: List[Block], timezone_offset: int) -> List[int]:
+    """Return each block's local minute-of-day, computed once per forecast."""
+    if not forecast:
+        return []
+    # The full ``dt`` sequence: gapped forecasts can share count, first
+    # timestamp and sum while mapping to different local minutes.
+    key = (timezone_offset, tuple(int(block['dt']) for block in forecast))
+    with _local_tables_lock:
+        table = _local_tables.get(key)
+        if table is not None:
+            _local_tables.move_to_end(key)
+            return table
+    table = [_local_minute_of_day(block['dt'], timezone_offset) for block in forecast]
+    with _local_tables_lock:
+        _local_tables[key] = table
+        if len(_local_tables) > _LOCAL_TABLE_SLOTS:
+            _local_tables.popitem(last=False)
+    return table
+
+
+@lru_cache(maxsize=4096)
 def format_window(start_ts: int, end_ts: int, timezone_offset: int) -> str:
     """Return a friendly string for a window using the task's local time."""
     start_local = _to_timezone_struct(start_ts, timezone_offset)
@@ -27,54 +69,149 @@ def format_window(start_ts: int, end_ts: int, timezone_offset: int) -> str:
     return f"{start_month}/{start_day} {start_hour} {start_ampm} - {end_hour} {end_ampm}"
 
 
-def _parse_time_string(value: Optional[str]) -> Optional[Tuple[int, int]]:
+@lru_cache(maxsize=256)
+def _parse_minute_of_day(value: Optional[str]) -> Optional[int]:
+    """Parse an ``HH:MM`` bound into minutes since midnight."""
     if not value:
         return None
     hour_str, minute_str = value.split(':')
-    return int(hour_str), int(minute_str)
+    return int(hour_str) * 60 + int(minute_str)
 
 
-def _check_constraints(
-    entry: Block,
-    min_temp: Optional[float],
-    max_temp: Optional[float],
-    min_humidity: Optional[int],
-    max_humidity: Optional[int],
-    no_rain: bool,
-    earliest: Optional[Tuple[int, int]],
-    latest: Optional[Tuple[int, int]],
-    enforce_time: bool = True,
-    timezone_offset: int = 0,
-) -> Tuple[bool, Optional[str]]:
-    temp = entry.get('temp')
-    rain = entry.get('rain', 0) or 0
-    humidity = entry.get('humidity')
-    if temp is None:
-        return False, 'temperature missing from forecast'
-    if min_temp is not None and temp < min_temp:
-        return False, f'temperature below minimum ({temp:.0f}F < {min_temp:.0f}F)'
-    if max_temp is not None and temp > max_temp:
-        return False, f'temperature above maximum ({temp:.0f}F > {max_temp:.0f}F)'
-    if min_humidity is not None:
+BlockCheck = Callable[[Block], Optional[str]]
+
+
+def _temperature_present(entry: Block) -> Optional[str]:
+    if entry.get('temp') is None:
+        return 'temperature missing from forecast'
+    return None
+
+
+def _min_temp_check(min_temp: float) -> BlockCheck:
+    label = f'{min_temp:.0f}F'
+
+    def check(entry: Block) -> Optional[str]:
+        temp = entry['temp']
+        if temp < min_temp:
+            return f'temperature below minimum ({temp:.0f}F < {label})'
+        return None
+    return check
+
+
+def _max_temp_check(max_temp: float) -> BlockCheck:
+    label = f'{max_temp:.0f}F'
+
+    def check(entry: Block) -> Optional[str]:
+        temp = entry['temp']
+        if temp > max_temp:
+            return f'temperature above maximum ({temp:.0f}F > {label})'
+        return None
+    return check
+
+
+def _min_humidity_check(min_humidity: int) -> BlockCheck:
+    def check(entry: Block) -> Optional[str]:
+        humidity = entry.get('humidity')
         if humidity is None:
-            return False, 'humidity missing from forecast'
+            return 'humidity missing from forecast'
         if humidity < min_humidity:
-            return False, f'humidity below minimum ({humidity}% < {min_humidity}%)'
-    if max_humidity is not None:
+            return f'humidity below minimum ({humidity}% < {min_humidity}%)'
+        return None
+    return check
+
+
+def _max_humidity_check(max_humidity: int) -> BlockCheck:
+    def check(entry: Block) -> Optional[str]:
+        humidity = entry.get('humidity')
         if humidity is None:
-            return False, 'humidity missing from forecast'
+            return 'humidity missing from forecast'
         if humidity > max_humidity:
-            return False, f'humidity above maximum ({humidity}% > {max_humidity}%)'
-    if no_rain and rain > 0:
-        return False, 'rain expected during window'
-    if enforce_time and (earliest or latest):
-        dt_local = _to_timezone_struct(entry['dt'], timezone_offset)
-        current_hour = (dt_local.tm_hour, dt_local.tm_min)
-        if earliest and current_hour < earliest:
-            return False, f'start before earliest allowed ({dt_local.tm_hour:02d}:{dt_local.tm_min:02d})'
-        if latest and current_hour > latest:
-            return False, f'start after latest allowed ({dt_local.tm_hour:02d}:{dt_local.tm_min:02d})'
-    return True, None
+            return f'humidity above maximum ({humidity}% > {max_humidity}%)'
+        return None
+    return check
+
+
+def _no_rain_check(entry: Block) -> Optional[str]:
+    if (entry.get('rain', 0) or 0) > 0:
+        return 'rain expected during window'
+    return None
+
+
+class CompiledConstraints:
+    """A task's constraints reduced to the checks that are actually active.
+
+    Built by :func:`compile_constraints`; block checks run in the same order
+    and yield the same failure reasons as the original sequential tests.
+    """
+
+    __slots__ = ('fingerprint', 'duration_hours', 'earliest', 'latest', 'checks', 'has_time_bounds')
+
+    def __init__(self, fingerprint: Tuple[object, ...]) -> None:
+        min_temp, max_temp, min_humidity, max_humidity, no_rain, duration_hours, earliest_start, latest_start = fingerprint
+        self.fingerprint = fingerprint
+        self.duration_hours = duration_hours
+        self.earliest = _parse_minute_of_day(earliest_start)
+        self.latest = _parse_minute_of_day(latest_start)
+        self.has_time_bounds = self.earliest is not None or self.latest is not None
+        checks: List[BlockCheck] = [_temperature_present]
+        if min_temp is not None:
+            checks.append(_min_temp_check(min_temp))
+        if max_temp is not None:
+            checks.append(_max_temp_check(max_temp))
+        if min_humidity is not None:
+            checks.append(_min_humidity_check(min_humidity))
+        if max_humidity is not None:
+            checks.append(_max_humidity_check(max_humidity))
+        if no_rain:
+            checks.append(_no_rain_check)
+        self.checks: Tuple[BlockCheck, ...] = tuple(checks)
+
+    def block_failure(self, entry: Block) -> Optional[str]:
+        """Return why ``entry`` cannot be part of a window, or ``None``."""
+        for check in self.checks:
+            reason = check(entry)
+            if reason is not None:
+                return reason
+        return None
+
+    def start_failure(self, local_minute: int) -> Optional[str]:
+        """Return why a window cannot start at ``local_minute``, or ``None``."""
+        if self.earliest is not None and local_minute < self.earliest:
+            return f'start before earliest allowed ({_format_minute_of_day(local_minute)})'
+        if self.latest is not None and local_minute > self.latest:
+            return f'start after latest allowed ({_format_minute_of_day(local_minute)})'
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _compile_cached(fingerprint: Tuple[object, ...], types: Tuple[type, ...]) -> CompiledConstraints:
+    return CompiledConstraints(fingerprint)
+
+
+def compile_constraints(fingerprint: Tuple[object, ...]) -> CompiledConstraints:
+    """Return the (cached) compiled predicate for a constraint fingerprint."""
+    # Value types are part of the key: ``30`` and ``30.0`` compare equal but
+    # render differently in failure reasons.
+    return _compile_cached(fingerprint, tuple(type(value) for value in fingerprint))
+
+
+def compile_task(task: object) -> CompiledConstraints:
+    """Compile a ``models.Task`` or ``schemas.TaskCreate`` into a predicate."""
+    return compile_constraints(constraint_fingerprint(task))
+
+
+def constraint_fingerprint(task: object) -> Tuple[object, ...]:
+    """Return the task fields that determine its scheduling windows."""
+    return (
+        getattr(task, 'min_temp', None),
+        getattr(task, 'max_temp', None),
+        getattr(task, 'min_humidity', None),
+        getattr(task, 'max_humidity', None),
+        bool(getattr(task, 'no_rain', True)),
+        getattr(task, 'duration_hours', None),
+        getattr(task, 'earliest_start', None),
+        getattr(task, 'latest_start', None),
+    )
 
 
 def _summarize_failures(failures: Counter) -> Optional[str]:
@@ -98,12 +235,28 @@ def find_windows(
     timezone_offset: int = 0,
 ) -> Dict[str, object]:
     """Given hourly forecast and task constraints, find viable time windows."""
+    compiled = compile_constraints(
+        (min_temp, max_temp, min_humidity, max_humidity, bool(no_rain), duration_hours, earliest_start, latest_start)
+    )
+    return scan_windows(forecast, compiled, timezone_offset)
+
+
+def find_windows_for_task(
+    forecast: List[Block], task: object, timezone_offset: int = 0
+) -> Dict[str, object]:
+    """Run :func:`find_windows` with the constraints stored on ``task``."""
+    return scan_windows(forecast, compile_task(task), timezone_offset)
+
+
+def scan_windows(
+    forecast: List[Block], constraints: CompiledConstraints, timezone_offset: int = 0
+) -> Dict[str, object]:
+    """Find viable time windows for already compiled constraints."""
+    duration_hours = constraints.duration_hours
     if not forecast:
         return {'windows': [], 'reason_summary': 'No forecast data was returned for this ZIP code.', 'reason_details': []}
     if duration_hours <= 0:
         return {'windows': [], 'reason_summary': 'Duration must be greater than zero.', 'reason_details': []}
-    earliest = _parse_time_string(earliest_start)
-    latest = _parse_time_string(latest_start)
     valid_windows: List[Dict[str, str]] = []
     block_hours = 3
     failures: Counter[str] = Counter()
@@ -111,6 +264,12 @@ def find_windows(
     if duration_hours > max_available:
         summary = 'Forecast horizon is shorter than the required task duration.'
         return {'windows': [], 'reason_summary': summary, 'reason_details': []}
+    local_minutes = (
+        local_minutes_table(forecast, timezone_offset)
+        if constraints.has_time_bounds
+        else None
+    )
+    block_failure = constraints.block_failure
     i = 0
     n = len(forecast)
     while i < n:
@@ -127,22 +286,11 @@ def find_windows(
                 failures['forecast data gaps prevent continuous window'] += 1
                 window_failed = True
                 break
-            enforce_time = j == start_idx
-            block_valid, block_reason = _check_constraints(
-                block,
-                min_temp,
-                max_temp,
-                min_humidity,
-                max_humidity,
-                no_rain,
-                earliest if enforce_time else None,
-                latest if enforce_time else None,
-                enforce_time=enforce_time,
-                timezone_offset=timezone_offset,
-            )
-            if not block_valid:
-                if block_reason:
-                    failures[block_reason] += 1
+            block_reason = block_failure(block)
+            if block_reason is None and j == start_idx and local_minutes is not None:
+                block_reason = constraints.start_failure(local_minutes[j])
+            if block_reason is not None:
+                failures[block_reason] += 1
                 window_failed = True
                 break
             total_hours += block_hours
@@ -0,0 +1,113 @@
+"""ETag helpers and a small in-process cache of serialized responses."""
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from fastapi import Response
+
+V = TypeVar("V")
+
+# Upper bound on the serialized response bodies kept per process.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe least-recently-used mapping with a fixed entry budget.
+
+    With ``max_bytes`` set, entries are also evicted until the values' total
+    ``size_of`` fits, and a value larger than the whole budget is not stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        *,
+        max_bytes: Optional[int] = None,
+        size_of: Callable[[V], int] = len,
+    ) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._size_of = size_of
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _weigh(self, value: V) -> int:
+        return self._size_of(value) if self._max_bytes is not None else 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        size = self._weigh(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._weigh(previous)
+            if self._max_bytes is not None and size > self._max_bytes:
+                return
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self._max_entries or (
+                self._max_bytes is not None and self._bytes > self._max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._weigh(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def make_etag(*parts: object) -> str:
+    """Build a strong ETag from the values that determine a response."""
+    digest = hashlib.sha1("|".join(repr(part) for part in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an ``If-None-Match`` header using weak comparison (RFC 9110)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def json_response(body: bytes, etag: str) -> Response:
+    """Return pre-serialized JSON tagged for client revalidation."""
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"},
+    )
+
+
+# Serialized response bodies keyed by ETag. Bodies for superseded table or
+# forecast versions are never requested again, so the byte budget, not the
+# entry count, is what keeps a burst of large task lists from pinning memory.
+response_cache: LRUCache[bytes] = LRUCache(max_entries=256, max_bytes=RESPONSE_CACHE_MAX_BYTES)
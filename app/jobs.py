@@ -0,0 +1,338 @@
+"""In-process background jobs for long-running operations.
+
+Jobs are recorded in the ``jobs`` table so their state and progress survive
+the request that started them and can be polled from any worker. Each
+process runs a bounded queue drained by ``JOB_MAX_CONCURRENCY`` threads;
+submissions beyond ``JOB_QUEUE_SIZE`` waiting jobs are refused. Those limits
+are per process, so a job is only claimed while no other job of its kind is
+running in any worker; it waits in its queue until then.
+
+Each process renews a lease (``heartbeat_at``) on the unfinished jobs it owns.
+A queued or running job whose lease has not been renewed for
+``JOB_LEASE_SECONDS`` belongs to a worker that is gone and is marked failed,
+so it cannot block later jobs of its kind.
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import uuid
+
+from sqlalchemy import exists, func, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session
+
+from . import crud, database, metrics, models, scheduling
+
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "16"))
+JOB_MAX_CONCURRENCY = int(os.environ.get("JOB_MAX_CONCURRENCY", "1"))
+# Progress is persisted at most this often while a job runs.
+JOB_PROGRESS_INTERVAL_SECONDS = 1.0
+# How often a job blocked by one of its kind running elsewhere retries its claim.
+JOB_CLAIM_RETRY_SECONDS = 1.0
+# Unfinished jobs whose lease is older than this are treated as orphaned.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# How often a process renews the leases of the jobs it owns.
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+RESCHEDULE = "reschedule"
+
+# Identifies the process that queued and runs a job. The random suffix keeps
+# a restarted worker that got its predecessor's pid from renewing its leases.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued."""
+
+    def __init__(self, message: str, *, status_code: int = 503) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _record_progress(db: Session, job: models.Job, result: scheduling.SweepResult) -> None:
+    job.processed = result.tasks
+    job.rescheduled = result.rescheduled
+    job.unchanged = result.unchanged
+    job.skipped = result.skipped
+    job.failed = result.failed
+    job.errors = json.dumps(result.errors[-50:])
+    job.heartbeat_at = datetime.utcnow()
+    db.commit()
+
+
+def run_reschedule(job_id: int, should_cancel: Callable[[], bool]) -> str:
+    """Run a full rescheduling sweep for ``job_id``; return its final status."""
+    with database.SessionLocal() as jobs_db, database.SessionLocal() as db:
+        job = jobs_db.get(models.Job, job_id)
+        job.total = crud.count_tasks(db)
+        jobs_db.commit()
+        last_saved = time.monotonic()
+
+        def cancelled() -> bool:
+            # ``cancel_requested`` is re-read after each progress commit, which
+            # picks up cancellations made through another worker process.
+            return should_cancel() or bool(job.cancel_requested)
+
+        def progress(result: scheduling.SweepResult) -> None:
+            nonlocal last_saved
+            now = time.monotonic()
+            if now - last_saved >= JOB_PROGRESS_INTERVAL_SECONDS:
+                _record_progress(jobs_db, job, result)
+                last_saved = now
+
+        result = scheduling.reschedule_all(db, progress=progress, should_cancel=cancelled)
+        _record_progress(jobs_db, job, result)
+    return CANCELLED if result.cancelled else SUCCEEDED
+
+
+_RUNNERS: Dict[str, Callable[[int, Callable[[], bool]], str]] = {
+    RESCHEDULE: run_reschedule,
+}
+
+
+class JobManager:
+    """Bounded queue of job ids drained by a fixed number of worker threads."""
+
+    def __init__(self, *, queue_size: int = JOB_QUEUE_SIZE, concurrency: int = JOB_MAX_CONCURRENCY) -> None:
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._concurrency = max(1, concurrency)
+        self._threads: List[threading.Thread] = []
+        self._cancel_events: Dict[int, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for index in range(self._concurrency):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            heartbeat.start()
+            self._threads.append(heartbeat)
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Cancel queued and running jobs and wait for the workers to exit."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping.set()
+            for event in self._cancel_events.values():
+                event.set()
+        waiting = []
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is not None:
+                waiting.append(job_id)
+        if waiting:
+            with database.SessionLocal() as db:
+                for job in db.query(models.Job).filter(models.Job.id.in_(waiting)):
+                    self._finish(db, job, CANCELLED, "Server shut down before the job started.")
+        for _ in range(len(threads) - 1):
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, kind: str) -> models.Job:
+        if kind not in _RUNNERS:
+            raise ValueError(f"Unknown job kind '{kind}'.")
+        self.start()
+        with database.SessionLocal() as db:
+            job = models.Job(
+                kind=kind,
+                status=QUEUED,
+                created_at=datetime.utcnow(),
+                heartbeat_at=datetime.utcnow(),
+                errors="[]",
+                worker=WORKER_ID,
+            )
+            db.add(job)
+            db.commit()
+            with self._lock:
+                self._cancel_events[job.id] = threading.Event()
+            try:
+                self._queue.put_nowait(job.id)
+            except queue.Full:
+                db.delete(job)
+                db.commit()
+                with self._lock:
+                    self._cancel_events.pop(job.id, None)
+                metrics.registry.increment("jobs.rejected")
+                raise JobQueueFull("Too many jobs are waiting; try again later.")
+            metrics.registry.increment("jobs.submitted")
+            db.refresh(job)
+            db.expunge(job)
+            return job
+
+    def cancel(self, job_id: int) -> Optional[models.Job]:
+        """Request cancellation; queued jobs are cancelled before they start."""
+        with database.SessionLocal() as db:
+            job = db.get(models.Job, job_id)
+            if job is None:
+                return None
+            if job.status not in FINISHED_STATES:
+                job.cancel_requested = True
+                db.flush()
+                # Only a job no worker has claimed yet is cancelled outright.
+                dequeued = db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job_id, models.Job.status == QUEUED)
+                    .values(status=CANCELLED, finished_at=datetime.utcnow())
+                ).rowcount
+                db.commit()
+                if dequeued:
+                    metrics.registry.increment(f"jobs.{CANCELLED}")
+                with self._lock:
+                    event = self._cancel_events.get(job_id)
+                if event is not None:
+                    event.set()
+            db.refresh(job)
+            db.expunge(job)
+            return job
+
+    @staticmethod
+    def _finish(db: Session, job: models.Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        if error is not None:
+            job.errors = json.dumps(json.loads(job.errors or "[]") + [error])
+        db.commit()
+        metrics.registry.increment(f"jobs.{status}")
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with database.SessionLocal() as db:
+                    db.execute(
+                        update(models.Job)
+                        .where(models.Job.worker == WORKER_ID, models.Job.status.in_((QUEUED, RUNNING)))
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.commit()
+                    fail_orphaned_jobs(db)
+            except Exception:  # retried on the next beat, well within the lease
+                metrics.registry.increment("jobs.heartbeat_failures")
+
+    @staticmethod
+    def _claim(db: Session, job_id: int, kind: str) -> bool:
+        # One conditional update: a cancellation committed meanwhile wins, and
+        # the claim fails while a job of the same kind runs in any process.
+        # Running jobs whose worker is gone are failed first so they cannot
+        # block the claim forever.
+        fail_orphaned_jobs(db, kind=kind, statuses=(RUNNING,))
+        other = aliased(models.Job)
+        claimed = db.execute(
+            update(models.Job)
+            .where(
+                models.Job.id == job_id,
+                models.Job.status == QUEUED,
+                ~exists().where(other.kind == kind, other.status == RUNNING),
+            )
+            .values(status=RUNNING, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        return bool(claimed)
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            finally:
+                with self._lock:
+                    self._cancel_events.pop(job_id, None)
+
+    def _run(self, job_id: int) -> None:
+        with self._lock:
+            cancel_event = self._cancel_events.get(job_id) or threading.Event()
+        with database.SessionLocal() as db:
+            if cancel_event.is_set():
+                job = db.get(models.Job, job_id)
+                if job is not None and job.status == QUEUED:
+                    self._finish(db, job, CANCELLED)
+                return
+            kind = db.get(models.Job, job_id).kind
+            while not self._claim(db, job_id, kind):
+                job = db.get(models.Job, job_id)
+                db.refresh(job)
+                if job.status != QUEUED:
+                    return
+                # A job of this kind is running in some worker; retry once it
+                # may have finished unless this one is cancelled meanwhile.
+                if job.cancel_requested or cancel_event.wait(JOB_CLAIM_RETRY_SECONDS):
+                    db.refresh(job)
+                    if job.status == QUEUED:
+                        self._finish(db, job, CANCELLED)
+                    return
+            runner = _RUNNERS[kind]
+        started = time.perf_counter()
+        try:
+            status = runner(job_id, cancel_event.is_set)
+        except Exception as exc:  # reported through the job record
+            with database.SessionLocal() as db:
+                self._finish(db, db.get(models.Job, job_id), FAILED, f"{type(exc).__name__}: {exc}")
+        else:
+            with database.SessionLocal() as db:
+                self._finish(db, db.get(models.Job, job_id), status)
+        metrics.registry.observe("jobs.run_seconds", time.perf_counter() - started)
+
+
+ORPHANED_MESSAGE = "The worker running this job stopped renewing its lease."
+
+
+def fail_orphaned_jobs(
+    db: Session, *, kind: Optional[str] = None, statuses: Sequence[str] = (QUEUED, RUNNING)
+) -> int:
+    """Fail unfinished jobs whose lease has expired; return how many."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    lease = func.coalesce(models.Job.heartbeat_at, models.Job.created_at)
+    query = db.query(models.Job).filter(models.Job.status.in_(statuses), lease < cutoff)
+    if kind is not None:
+        query = query.filter(models.Job.kind == kind)
+    failed = 0
+    for job in query.all():
+        errors = json.dumps(json.loads(job.errors or "[]") + [ORPHANED_MESSAGE])
+        # Conditional on the expired lease, so a worker that renewed it
+        # meanwhile keeps its job.
+        failed += db.execute(
+            update(models.Job)
+            .where(models.Job.id == job.id, models.Job.status == job.status, lease < cutoff)
+            .values(status=FAILED, finished_at=datetime.utcnow(), errors=errors)
+        ).rowcount
+    db.commit()
+    if failed:
+        metrics.registry.increment(f"jobs.{FAILED}", failed)
+        metrics.registry.increment("jobs.recovered", failed)
+    return failed
+
+
+def recover_orphaned_jobs() -> int:
+    """Fail jobs left unfinished by workers that are gone; call on startup."""
+    with database.SessionLocal() as db:
+        return fail_orphaned_jobs(db)
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.Job]:
+    return db.get(models.Job, job_id)
+
+
+manager = JobManager()
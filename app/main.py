@@ -1,55 +1,81 @@
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
 
-from . import crud, find_windows, models, schemas, weather
+from . import batch, crud, database, events, find_windows, http_cache, jobs, metrics, schemas, weather, zip_clusters
+from .database import SessionLocal, get_db
 
-DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+APP_DIR = Path(__file__).resolve().parent
 
-models.Base.metadata.create_all(bind=engine)
+# Asset modification times are re-read at most this often.
+ASSET_RECHECK_SECONDS = 5.0
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def __getattr__(name: str):
+    # ``engine`` is created on first use rather than at import time.
+    if name == "engine":
+        return database.get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = FastAPI()
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+@lru_cache(maxsize=1)
+def get_templates():
+    # Jinja2 is only imported once a page is actually rendered.
+    from fastapi.templating import Jinja2Templates
 
-# Templates
-templates = Jinja2Templates(directory="app/templates")
+    return Jinja2Templates(directory=str(APP_DIR / "templates"))
+
+
+_ASSET_PATHS = {
+    "templates/index.html": APP_DIR / "templates" / "index.html",
+    "static/css/style.css": APP_DIR / "static" / "css" / "style.css",
+    "static/js/main.js": APP_DIR / "static" / "js" / "main.js",
+}
+_asset_mtimes: Dict[str, Optional[datetime]] = {}
+_asset_checked_at: Optional[float] = None
+_asset_lock = threading.Lock()
 
-APP_DIR = Path(__file__).resolve().parent
+
+def _asset_modification_times() -> Dict[str, Optional[datetime]]:
+    """Return cached asset mtimes, re-reading them every few seconds."""
+    global _asset_mtimes, _asset_checked_at
+    with _asset_lock:
+        now = time.monotonic()
+        if _asset_checked_at is None or now - _asset_checked_at >= ASSET_RECHECK_SECONDS:
+            mtimes: Dict[str, Optional[datetime]] = {}
+            for key, path in _ASSET_PATHS.items():
+                try:
+                    mtimes[key] = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+                except FileNotFoundError:
+                    mtimes[key] = None
+            _asset_mtimes = mtimes
+            _asset_checked_at = now
+        return _asset_mtimes
 
 
 def _build_asset_debug_payload() -> Dict[str, object]:
     """Return debug metadata about key template and static assets."""
 
-    def capture_file_metadata(label: str, path: Path, *, now: datetime) -> Dict[str, object]:
-        try:
-            stat_result = path.stat()
-        except FileNotFoundError:
+    def capture_file_metadata(
+        label: str, path: Path, last_modified: Optional[datetime], *, now: datetime
+    ) -> Dict[str, object]:
+        if last_modified is None:
             return {
                 "label": label,
                 "path": str(path),
                 "exists": False,
             }
 
-        last_modified = datetime.fromtimestamp(stat_result.st_mtime, timezone.utc)
         age_seconds = max(0, int((now - last_modified).total_seconds()))
 
         return {
@@ -61,13 +87,10 @@ def _build_asset_debug_payload() -> Dict[str, object]:
         }
 
     now = datetime.now(timezone.utc)
+    mtimes = _asset_modification_times()
     assets = {
-        key: capture_file_metadata(key, file_path, now=now)
-        for key, file_path in {
-            "templates/index.html": APP_DIR / "templates" / "index.html",
-            "static/css/style.css": APP_DIR / "static" / "css" / "style.css",
-            "static/js/main.js": APP_DIR / "static" / "js" / "main.js",
-        }.items()
+        key: capture_file_metadata(key, file_path, mtimes[key], now=now)
+        for key, file_path in _ASSET_PATHS.items()
     }
 
     return {
@@ -75,44 +98,159 @@ def _build_asset_debug_payload() -> Dict[str, object]:
         "assets": assets,
     }
 
-@app.get("/", response_class=HTMLResponse)
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    if database.AUTO_CREATE_SCHEMA:
+        database.init_schema()
+    zip_clusters.check_table()
+    jobs.recover_orphaned_jobs()
+    jobs.manager.start()
+    yield
+    jobs.manager.stop()
+    batch.shutdown_pool()
+
+
+router = APIRouter()
+
+@router.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     context = {
-        "request": request,
         "asset_debug": _build_asset_debug_payload(),
     }
-    return templates.TemplateResponse("index.html", context)
+    return get_templates().TemplateResponse(request, "index.html", context)
 
-@app.post("/tasks/", response_model=schemas.TaskMutationResponse)
+@router.post("/tasks/", response_model=schemas.TaskMutationResponse)
 def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
     return crud.create_task(db, task)
 
-@app.get("/tasks/", response_model=List[schemas.Task])
-def read_tasks(db: Session = Depends(get_db)):
-    return crud.get_tasks(db)
+_task_list_adapter = TypeAdapter(List[schemas.Task])
 
-@app.get("/tasks/{task_id}", response_model=schemas.Task)
-def read_task(task_id: int, db: Session = Depends(get_db)):
-    task = crud.get_task(db, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
 
-@app.put("/tasks/{task_id}", response_model=schemas.TaskMutationResponse)
+@router.get("/tasks/", response_model=List[schemas.Task])
+def read_tasks(request: Request, db: Session = Depends(get_db)):
+    etag = http_cache.make_etag("tasks", crud.get_table_version())
+    if http_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return http_cache.not_modified(etag)
+    body = http_cache.response_cache.get(etag)
+    if body is None:
+        tasks = _task_list_adapter.validate_python(crud.get_tasks(db), from_attributes=True)
+        body = _task_list_adapter.dump_json(tasks)
+        http_cache.response_cache.set(etag, body)
+    return http_cache.json_response(body, etag)
+
+@router.get("/tasks/{task_id}", response_model=schemas.Task)
+def read_task(task_id: int, request: Request, db: Session = Depends(get_db)):
+    etag = http_cache.make_etag("task", task_id, crud.get_table_version())
+    if http_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return http_cache.not_modified(etag)
+    body = http_cache.response_cache.get(etag)
+    if body is None:
+        task = crud.get_task(db, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        body = schemas.Task.model_validate(task).model_dump_json().encode("utf-8")
+        http_cache.response_cache.set(etag, body)
+    return http_cache.json_response(body, etag)
+
+@router.put("/tasks/{task_id}", response_model=schemas.TaskMutationResponse)
 def update_task(task_id: int, task: schemas.TaskCreate, db: Session = Depends(get_db)):
     updated = crud.update_task(db, task_id, task)
     if not updated:
         raise HTTPException(status_code=404, detail="Task not found")
     return updated
 
-@app.delete("/tasks/{task_id}")
+@router.delete("/tasks/{task_id}")
 def delete_task(task_id: int, db: Session = Depends(get_db)):
     if not crud.delete_task(db, task_id):
         raise HTTPException(status_code=404, detail="Task not found")
     return {"ok": True}
 
-@app.post("/suggestions/", response_model=schemas.SuggestionResponse)
-def get_suggestions(request: schemas.SuggestionRequest, db: Session = Depends(get_db)):
+@router.get("/events/tasks")
+async def stream_task_events(request: Request):
+    """Stream task create/update/delete and schedule deltas as Server-Sent Events."""
+    subscription = events.broker.subscribe(request.headers.get("last-event-id"))
+
+    async def event_stream():
+        try:
+            async for frame in subscription.stream():
+                if await request.is_disconnected():
+                    break
+                yield frame
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class _SuggestionTag(NamedTuple):
+    table_version: str
+    location: str
+    forecast_version: str
+    etag: str
+
+
+# Latest suggestion ETag per task id. An entry stays valid while neither the
+# tasks table nor the cached forecast for its location has changed, which lets
+# repeat requests be answered without touching the DB or the window engine.
+_suggestion_tags: http_cache.LRUCache[_SuggestionTag] = http_cache.LRUCache(max_entries=1024)
+
+
+def _current_suggestion_tag(task_id: int) -> Optional[_SuggestionTag]:
+    tag = _suggestion_tags.get(task_id)
+    if tag is None or tag.table_version != crud.get_table_version():
+        return None
+    if weather.get_cached_forecast_version(tag.location) != tag.forecast_version:
+        return None
+    return tag
+
+
+@router.post("/jobs/reschedule", response_model=schemas.Job, status_code=202)
+def start_reschedule_job():
+    """Queue a sweep recomputing every task's schedule; poll it via ``/jobs/{id}``."""
+    try:
+        job = jobs.manager.submit(jobs.RESCHEDULE)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return job
+
+@router.get("/jobs/{job_id}", response_model=schemas.Job)
+def read_job(job_id: int, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(job_id: int):
+    job = jobs.manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/metrics/")
+def read_metrics():
+    return metrics.registry.snapshot()
+
+@router.post("/suggestions/", response_model=schemas.SuggestionResponse)
+def get_suggestions(
+    request: schemas.SuggestionRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+):
+    if_none_match = http_request.headers.get("if-none-match")
+    tag = _current_suggestion_tag(request.task_id)
+    if tag is not None:
+        if http_cache.etag_matches(if_none_match, tag.etag):
+            return http_cache.not_modified(tag.etag)
+        body = http_cache.response_cache.get(tag.etag)
+        if body is not None:
+            return http_cache.json_response(body, tag.etag)
+
+    table_version = crud.get_table_version()
     task = crud.get_task(db, request.task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -124,20 +262,39 @@ def get_suggestions(request: schemas.SuggestionRequest, db: Session = Depends(ge
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    window_result = find_windows.find_windows(
-        forecast=forecast,
-        min_temp=task.min_temp,
-        max_temp=task.max_temp,
-        min_humidity=getattr(task, 'min_humidity', None),
-        max_humidity=getattr(task, 'max_humidity', None),
-        no_rain=bool(task.no_rain),
-        duration_hours=task.duration_hours,
-        earliest_start=getattr(task, 'earliest_start', None),
-        latest_start=getattr(task, 'latest_start', None),
-        timezone_offset=timezone_offset,
+    forecast_version = weather.get_cached_forecast_version(task.location)
+    if forecast_version is None:
+        forecast_version = weather.forecast_version(forecast, timezone_offset)
+    etag = http_cache.make_etag(
+        "suggestions", find_windows.constraint_fingerprint(task), forecast_version
     )
-    return schemas.SuggestionResponse(
+    _suggestion_tags.set(
+        request.task_id,
+        _SuggestionTag(table_version, task.location, forecast_version, etag),
+    )
+    if http_cache.etag_matches(if_none_match, etag):
+        return http_cache.not_modified(etag)
+    body = http_cache.response_cache.get(etag)
+    if body is not None:
+        return http_cache.json_response(body, etag)
+
+    window_result = find_windows.find_windows_for_task(forecast, task, timezone_offset)
+    suggestion = schemas.SuggestionResponse(
         possible_windows=window_result.get("windows", []),
         reason_summary=window_result.get("reason_summary"),
         reason_details=window_result.get("reason_details", []),
     )
+    body = suggestion.model_dump_json().encode("utf-8")
+    http_cache.response_cache.set(etag, body)
+    return http_cache.json_response(body, etag)
+
+
+def create_app() -> FastAPI:
+    """Build the application; also usable with ``uvicorn --factory``."""
+    application = FastAPI(lifespan=lifespan)
+    application.mount("/static", StaticFiles(directory=APP_DIR / "static"), name="static")
+    application.include_router(router)
+    return application
+
+
+app = create_app()
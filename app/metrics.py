@@ -0,0 +1,55 @@
+"""Minimal in-process counters, gauges and timing summaries."""
+import threading
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+
+class MetricsRegistry:
+    """Thread-safe store of named metrics, exported as a JSON snapshot."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Number] = {}
+        self._gauges: Dict[str, Number] = {}
+        self._summaries: Dict[str, Dict[str, Number]] = {}
+
+    def increment(self, name: str, value: Number = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Number) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: Number) -> None:
+        """Record one sample (e.g. a duration in seconds)."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["max"] = max(summary["max"], value)
+
+    def counter(self, name: str) -> Number:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {name: dict(summary) for name, summary in self._summaries.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+registry = MetricsRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -13,8 +13,33 @@ class Task(Base):
     min_humidity = Column(Integer, nullable=True)
     max_humidity = Column(Integer, nullable=True)
     no_rain = Column(Boolean, default=True)  # True if rain not allowed
-    location = Column(String)
+    location = Column(String, index=True)
+    location_key = Column(String, nullable=True)  # normalized ZIP, e.g. "12345,US"
     created_at = Column(DateTime)
-    scheduled_time = Column(DateTime, nullable=True)
+    scheduled_time = Column(DateTime, nullable=True, index=True)
     earliest_start = Column(String, nullable=True)
     latest_start = Column(String, nullable=True)
+
+    # Serves both "tasks at this location" lookups and the ordered,
+    # location-grouped scan used by rescheduling sweeps.
+    __table_args__ = (Index("ix_tasks_location_key_id", "location_key", "id"),)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # e.g. "reschedule"
+    status = Column(String, nullable=False, index=True)  # queued/running/succeeded/failed/cancelled
+    cancel_requested = Column(Boolean, default=False)
+    worker = Column(String, nullable=True)  # "host:pid:nonce" of the process that queued it
+    heartbeat_at = Column(DateTime, nullable=True)  # lease renewed by that process
+    created_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    total = Column(Integer, default=0)  # tasks to process
+    processed = Column(Integer, default=0)
+    rescheduled = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    errors = Column(Text, default="[]")  # JSON list of messages
@@ -0,0 +1,195 @@
+"""Rescheduling sweeps: recompute ``scheduled_time`` for stored tasks."""
+import calendar
+from dataclasses import dataclass, field
+from datetime import datetime
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import batch, crud, metrics, models, weather
+
+# ``find_windows`` evaluates forecasts in 3-hour blocks.
+_BLOCK_HOURS = 3
+_BLOCK_SECONDS = _BLOCK_HOURS * 3600
+
+# Forecast version each location was last swept against, so the next sweep
+# can limit itself to the tasks a forecast change can actually affect.
+_swept_versions: Dict[str, str] = {}
+_swept_lock = threading.Lock()
+
+
+@dataclass
+class SweepResult:
+    groups: int = 0
+    tasks: int = 0
+    rescheduled: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    errors: List[str] = field(default_factory=list)
+
+
+def _first_start(window_result: Dict[str, object]) -> Optional[datetime]:
+    windows = window_result.get("windows") or []
+    if not windows:
+        return None
+    # Persist the scheduled time in UTC, matching crud.create_task.
+    return datetime.utcfromtimestamp(windows[0]["start_ts"])
+
+
+def _window_span(row: models.Task) -> Optional[Tuple[int, int]]:
+    if row.scheduled_time is None:
+        return None
+    start = calendar.timegm(row.scheduled_time.utctimetuple())
+    blocks = max(1, -(-(row.duration_hours or 0) // _BLOCK_HOURS))
+    return start, start + blocks * _BLOCK_SECONDS
+
+
+def _affected_filter(
+    location_key: str, version: str, first_block: Optional[int]
+) -> Optional[Callable[[models.Task], bool]]:
+    """Return a predicate selecting the tasks a forecast change can move.
+
+    ``None`` means every task in the group must be recomputed: the location
+    was never swept, or the cached delta does not connect the swept version
+    to the current one.
+    """
+    with _swept_lock:
+        swept = _swept_versions.get(location_key)
+    if swept is None:
+        return None
+    if swept == version:
+        earliest, removed = None, ()
+    else:
+        delta = weather.get_forecast_delta(location_key)
+        if (
+            delta is None
+            or delta.version != version
+            or delta.previous_version != swept
+            or delta.offset_changed
+        ):
+            return None
+        earliest, removed = delta.earliest_change(), delta.removed
+
+    def affected(row: models.Task) -> bool:
+        # A task whose current window ends before the first changed block
+        # and lost none of its own blocks still gets the same first window;
+        # blocks dropped before it cannot create an earlier one. Tasks
+        # without a window are always retried (their creation may have run
+        # without a forecast).
+        span = _window_span(row)
+        if span is None:
+            return True
+        start, end = span
+        if first_block is None or start < first_block:
+            # The window's first block has elapsed and was trimmed away.
+            return True
+        if earliest is not None and earliest < end:
+            return True
+        return any(start <= dt < end for dt in removed)
+
+    return affected
+
+
+def reset_swept_versions() -> None:
+    """Forget what previous sweeps saw, forcing the next one to recompute all."""
+    with _swept_lock:
+        _swept_versions.clear()
+
+
+def reschedule_all(
+    db: Session,
+    *,
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[SweepResult], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> SweepResult:
+    """Recompute every task's schedule with one forecast per location.
+
+    Tasks are read in a single scan ordered by ``location_key``; each group
+    fetches its forecast once and its windows are evaluated through
+    :mod:`app.batch`. Changed schedules are written by a
+    :class:`crud.ScheduledTimeWriter` in one transaction.
+
+    When a location's forecast changed since the last sweep only in blocks
+    after a task's current window, that task keeps its schedule without
+    being re-evaluated.
+
+    ``progress`` is called with the running result after each location
+    group. Once ``should_cancel`` returns true the scan stops, tasks not yet
+    evaluated keep their schedule and the changes found so far are written.
+    """
+    result = SweepResult()
+    versions: Dict[str, str] = {}
+    pending_units: List[batch.WorkUnit] = []
+    pending_forecasts: Dict[str, Tuple[List[dict], int]] = {}
+    previous: Dict[int, Optional[datetime]] = {}
+    # Changes are held until the scan finishes and then written with one
+    # executemany UPDATE in one short transaction.
+    writer = crud.ScheduledTimeWriter(db, batch_size=None)
+    flush_at = max(1, batch.BATCH_CHUNK_SIZE if chunk_size is None else chunk_size) * max(
+        1, batch.BATCH_MAX_WORKERS if max_workers is None else max_workers
+    )
+
+    def evaluate_pending() -> None:
+        computed = batch.compute_windows_batch(
+            pending_units,
+            pending_forecasts,
+            max_workers=max_workers,
+            chunk_size=chunk_size,
+        )
+        for task_id, window_result in computed.items():
+            scheduled_time = _first_start(window_result)
+            if scheduled_time == previous[task_id]:
+                result.unchanged += 1
+            else:
+                writer.add(task_id, scheduled_time, previous[task_id])
+                result.rescheduled += 1
+        pending_units.clear()
+        pending_forecasts.clear()
+
+    for location_key, rows in crud.iter_task_groups(db):
+        if should_cancel is not None and should_cancel():
+            result.cancelled = True
+            break
+        result.groups += 1
+        result.tasks += len(rows)
+        try:
+            forecast, timezone_offset = weather.fetch_hourly_forecast(location_key)
+        except (weather.WeatherServiceError, ValueError) as exc:
+            result.failed += len(rows)
+            result.errors.append(f"{location_key}: {exc}")
+            if progress is not None:
+                progress(result)
+            continue
+        version = weather.forecast_version(forecast, timezone_offset)
+        versions[location_key] = version
+        affected = _affected_filter(location_key, version, forecast[0]["dt"] if forecast else None)
+        for row in rows:
+            if affected is not None and not affected(row):
+                result.skipped += 1
+                continue
+            previous[row.id] = row.scheduled_time
+            pending_units.append(batch.WorkUnit.from_task(row, location_key))
+            pending_forecasts[location_key] = (forecast, timezone_offset)
+        if len(pending_units) >= flush_at:
+            evaluate_pending()
+        if progress is not None:
+            progress(result)
+    if pending_units and not result.cancelled:
+        evaluate_pending()
+
+    writer.flush()
+    # Tasks deleted or edited while the sweep ran were left untouched.
+    result.rescheduled -= writer.rows_skipped
+    result.skipped += writer.rows_skipped
+    if not result.cancelled:
+        # A partial sweep leaves some groups unevaluated; only a complete
+        # one may serve as the baseline for skipping work next time.
+        with _swept_lock:
+            _swept_versions.update(versions)
+    metrics.registry.increment("sweep.tasks_skipped", result.skipped)
+    return result
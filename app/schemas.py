@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator, ConfigDict
@@ -66,3 +67,30 @@ class SuggestionResponse(WindowSummary):
 
 class TaskMutationResponse(WindowSummary):
     task: Task
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    cancel_requested: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total: int = 0
+    processed: int = 0
+    rescheduled: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[str] = Field(default_factory=list)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('errors', mode='before')
+    @classmethod
+    def decode_errors(cls, value):
+        # Stored as a JSON-encoded text column.
+        if isinstance(value, str):
+            return json.loads(value or '[]')
+        return value or []
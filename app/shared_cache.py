@@ -0,0 +1,360 @@
+"""Host-local state shared between uvicorn worker processes.
+
+Enabled by pointing ``SHARED_CACHE_DIR`` at a directory every worker can
+reach, ideally on tmpfs such as ``/dev/shm``. Entries are replaced with an
+atomic rename, so readers never take a lock and always see a complete
+entry; writers serialize per key with ``flock`` so that one worker fetches
+while the others wait for its result.
+"""
+from contextlib import contextmanager
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts fall back to thread locks
+    fcntl = None
+
+
+def shared_cache_dir() -> Optional[Path]:
+    """Return the configured shared directory, or ``None`` when disabled."""
+    value = os.environ.get("SHARED_CACHE_DIR", "").strip()
+    return Path(value) if value else None
+
+
+class KeyedLocks:
+    """Per-key thread locks, dropped once no thread holds or awaits them.
+
+    Keeping a lock only while it is in use bounds the table by the number of
+    concurrent callers rather than by every key ever seen.
+    """
+
+    def __init__(self) -> None:
+        self._guard = threading.Lock()
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+
+    @contextmanager
+    def hold(self, key: str, *, blocking: bool = True) -> Iterator[bool]:
+        """Hold the lock for ``key``; yields whether it was acquired."""
+        with self._guard:
+            lock, users = self._locks.get(key) or (threading.Lock(), 0)
+            self._locks[key] = (lock, users + 1)
+        acquired = False
+        try:
+            acquired = lock.acquire(blocking)
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+            with self._guard:
+                users = self._locks[key][1] - 1
+                if users:
+                    self._locks[key] = (lock, users)
+                else:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+_thread_locks = KeyedLocks()
+
+
+@contextmanager
+def _exclusive(lock_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock across threads of this process and other processes."""
+    with _thread_locks.hold(str(lock_path)):
+        if fcntl is None:
+            yield
+            return
+        with open(lock_path, "a+b") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _try_exclusive(lock_path: Path) -> Iterator[bool]:
+    """Like :func:`_exclusive`, but yield ``False`` instead of waiting when busy."""
+    with _thread_locks.hold(str(lock_path), blocking=False) as acquired:
+        if not acquired or fcntl is None:
+            yield acquired
+            return
+        with open(lock_path, "a+b") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class SharedJSONStore:
+    """Directory of JSON documents keyed by short strings.
+
+    Each process keeps the last decoded document per key together with the
+    file's ``st_mtime_ns``/inode, so a hit costs one ``stat`` call rather than
+    a read and JSON decode.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._decoded: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+    def _path(self, key: str) -> Path:
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in key)
+        return self.directory / f"{safe}.json"
+
+    def read(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            return None
+        stamp = (stat_result.st_ino, stat_result.st_mtime_ns)
+        cached = self._decoded.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            value = json.loads(path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+        self._decoded[key] = (stamp, value)
+        return value
+
+    def write(self, key: str, value: Any) -> None:
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        _atomic_write(self._path(key), data)
+
+    def forget(self, key: str) -> None:
+        """Drop this process's decoded copy of ``key``; the file is kept."""
+        self._decoded.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        self._decoded.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        self._decoded.clear()
+        for path in self.directory.glob("*.json"):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def prune(self, *, max_bytes: Optional[int] = None, max_age: Optional[float] = None) -> int:
+        """Delete stale documents and their lock files; return how many.
+
+        Documents not rewritten for ``max_age`` seconds go first, then the
+        least recently written ones until the rest fit in ``max_bytes``.
+        Each is removed under its key lock, and keys that are locked (being
+        fetched) are skipped, as are documents rewritten in the meantime.
+        Lock files left without a document are removed the same way.
+        """
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat_result = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat_result.st_mtime_ns, stat_result.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff_ns = None if max_age is None else time.time_ns() - int(max_age * 1e9)
+        removed = 0
+        for mtime_ns, size, path in entries:
+            expired = cutoff_ns is not None and mtime_ns < cutoff_ns
+            if not expired and (max_bytes is None or total <= max_bytes):
+                break
+            if self._remove(path, mtime_ns):
+                total -= size
+                removed += 1
+        for lock_path in self.directory.glob("*.lock"):
+            if not lock_path.with_suffix(".json").exists():
+                self._remove(lock_path.with_suffix(".json"), None)
+        return removed
+
+    def _remove(self, path: Path, mtime_ns: Optional[int]) -> bool:
+        # ``mtime_ns`` is the version of the document seen when choosing it,
+        # or ``None`` to remove only a lock file whose document is absent.
+        lock_path = path.with_suffix(".lock")
+        with _try_exclusive(lock_path) as acquired:
+            if not acquired:
+                return False
+            try:
+                if path.stat().st_mtime_ns != mtime_ns:
+                    return False
+            except FileNotFoundError:
+                pass
+            for stale in (path, lock_path):
+                try:
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+        return True
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """Serialize writers of ``key`` across processes."""
+        with _exclusive(self._path(key).with_suffix(".lock")):
+            yield
+
+
+class SharedCounter:
+    """A 64-bit counter in a memory-mapped file with lock-free reads.
+
+    The file also stores a random epoch written when it is first created, so
+    values from a previous incarnation of the file (e.g. before a reboot
+    cleared tmpfs) never compare equal to current ones.
+    """
+
+    _LAYOUT = struct.Struct("<8sQ")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _exclusive(self.path.with_suffix(".lock")):
+            if not self.path.exists() or self.path.stat().st_size < self._LAYOUT.size:
+                _atomic_write(self.path, self._LAYOUT.pack(uuid.uuid4().bytes[:8], 0))
+        self._handle = open(self.path, "r+b")
+        self._map = mmap.mmap(self._handle.fileno(), self._LAYOUT.size)
+
+    @property
+    def epoch(self) -> str:
+        return self._LAYOUT.unpack_from(self._map, 0)[0].hex()
+
+    def value(self) -> str:
+        epoch, count = self._LAYOUT.unpack_from(self._map, 0)
+        return f"{epoch.hex()}.{count}"
+
+    def increment(self) -> int:
+        """Add one and return the new count."""
+        with _exclusive(self.path.with_suffix(".lock")):
+            epoch, count = self._LAYOUT.unpack_from(self._map, 0)
+            self._LAYOUT.pack_into(self._map, 0, epoch, count + 1)
+        return count + 1
+
+
+class SharedEventLog:
+    """Append-only log of JSON records that every worker process tails.
+
+    Each record gets the next number of a :class:`SharedCounter`, assigned
+    under the same lock as the append, so the file is in sequence order.
+    Once the file exceeds ``max_bytes`` it is renamed to ``<name>.1``
+    (replacing the previous one) and a new file is started; readers finish
+    the old file through their open handle before switching.
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int = 1 << 20) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        # Named so the counter's own lock file differs from the log's.
+        self._counter = SharedCounter(path.with_name(f"{path.stem}.seq.bin"))
+
+    @property
+    def epoch(self) -> str:
+        return self._counter.epoch
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append ``record`` under a new sequence number and return it."""
+        with _exclusive(self.path.with_suffix(".lock")):
+            seq = self._counter.increment()
+            line = json.dumps({"seq": seq, **record}, separators=(",", ":")).encode("utf-8") + b"\n"
+            try:
+                if self.path.stat().st_size + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            except FileNotFoundError:
+                pass
+            with open(self.path, "ab") as handle:
+                handle.write(line)
+        return seq
+
+    def reader(self) -> "SharedEventLogReader":
+        return SharedEventLogReader(self.path)
+
+
+class SharedEventLogReader:
+    """Follows a :class:`SharedEventLog` from the point it was created."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle = None
+        self._partial = b""
+        self._open(at_end=True)
+
+    def _open(self, *, at_end: bool) -> None:
+        try:
+            self._handle = open(self.path, "rb")
+        except FileNotFoundError:
+            self._handle = None
+            return
+        if at_end:
+            self._handle.seek(0, os.SEEK_END)
+
+    def _rotated(self) -> bool:
+        try:
+            current = self.path.stat()
+        except FileNotFoundError:
+            return False
+        if self._handle is None:
+            return True
+        opened = os.fstat(self._handle.fileno())
+        return (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev)
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Return the complete records appended since the last call."""
+        records: List[Dict[str, Any]] = []
+        while True:
+            if self._handle is not None:
+                chunk = self._partial + self._handle.read()
+                lines = chunk.split(b"\n")
+                self._partial = lines.pop()
+                for line in lines:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+            if not self._rotated():
+                return records
+            # Everything left in the old file was read above; follow the new one.
+            if self._handle is not None:
+                self._handle.close()
+            self._partial = b""
+            self._open(at_end=False)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
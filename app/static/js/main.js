@@ -78,6 +78,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let editingTaskId = null;
     const taskCache = new Map();
     const summaryCache = new Map();
+    const suggestionEtags = new Map();
 
     const fieldErrorElements = Object.freeze({
         taskName: document.getElementById('taskNameError'),
@@ -1202,11 +1203,7 @@ document.addEventListener('DOMContentLoaded', () => {
             tasks.forEach((task) => {
                 taskCache.set(task.id, task);
                 taskList.appendChild(createTaskElement(task));
-                const cachedSummary = summaryCache.get(task.id);
-                if (cachedSummary) {
-                    const windowsDiv = document.getElementById(`windows-${task.id}`);
-                    renderWindowSummary(windowsDiv, cachedSummary);
-                }
+                renderCachedSummary(task.id);
             });
         } catch (error) {
             console.error('Error loading tasks:', error);
@@ -1216,9 +1213,115 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    const renderCachedSummary = (taskId) => {
+        const cachedSummary = summaryCache.get(taskId);
+        if (cachedSummary) {
+            const windowsDiv = document.getElementById(`windows-${taskId}`);
+            renderWindowSummary(windowsDiv, cachedSummary);
+        }
+    };
+
+    const upsertTask = (task) => {
+        if (!task || task.id === undefined || task.id === null) {
+            return;
+        }
+        const placeholder = taskList.querySelector('p.text-red-600');
+        if (placeholder) {
+            placeholder.remove();
+        }
+        taskCache.set(task.id, task);
+        const element = createTaskElement(task);
+        const existing = document.getElementById(`task-${task.id}`);
+        if (existing) {
+            existing.replaceWith(element);
+        } else {
+            taskList.appendChild(element);
+        }
+        renderCachedSummary(task.id);
+    };
+
+    // A change made elsewhere can move the task's windows, so its cached
+    // summary and ETag must not be shown or revalidated again; the next
+    // "Find windows" fetches a fresh summary instead.
+    const forgetSummary = (taskId) => {
+        summaryCache.delete(taskId);
+        suggestionEtags.delete(taskId);
+    };
+
+    const removeTask = (taskId) => {
+        forgetSummary(taskId);
+        taskCache.delete(taskId);
+        const existing = document.getElementById(`task-${taskId}`);
+        if (existing) {
+            existing.remove();
+        }
+        if (editingTaskId === taskId) {
+            resetForm();
+        }
+    };
+
+    const applyScheduledTime = (taskId, scheduledTime) => {
+        const task = taskCache.get(taskId);
+        if (!task) {
+            return;
+        }
+        if (task.scheduled_time !== scheduledTime) {
+            forgetSummary(taskId);
+        }
+        upsertTask({ ...task, scheduled_time: scheduledTime });
+    };
+
+    const parseEventData = (event) => {
+        try {
+            return JSON.parse(event.data);
+        } catch (error) {
+            console.warn('Ignoring malformed task event', error);
+            return null;
+        }
+    };
+
+    const subscribeToTaskEvents = () => {
+        if (typeof window === 'undefined' || typeof window.EventSource !== 'function') {
+            return;
+        }
+        // The browser resends Last-Event-ID on reconnect so the server can
+        // replay missed deltas; it sends `resync` when that is not possible.
+        const source = new EventSource('/events/tasks');
+        const handleTaskSnapshot = (event) => {
+            const data = parseEventData(event);
+            if (data?.task) {
+                // Our own saves arrive here too, after the response already
+                // refreshed the summary; only a different snapshot makes it stale.
+                const known = taskCache.get(data.task.id);
+                if (JSON.stringify(known) !== JSON.stringify(data.task)) {
+                    forgetSummary(data.task.id);
+                }
+                upsertTask(data.task);
+            }
+        };
+        source.addEventListener('task.created', handleTaskSnapshot);
+        source.addEventListener('task.updated', handleTaskSnapshot);
+        source.addEventListener('task.deleted', (event) => {
+            const data = parseEventData(event);
+            if (data && data.id !== undefined) {
+                removeTask(data.id);
+            }
+        });
+        source.addEventListener('task.scheduled', (event) => {
+            const data = parseEventData(event);
+            if (data && data.id !== undefined) {
+                applyScheduledTime(data.id, data.scheduled_time ?? null);
+            }
+        });
+        source.addEventListener('resync', () => {
+            void loadTasks();
+        });
+    };
+
     function createTaskElement(task) {
         const div = document.createElement('div');
         div.className = 'task-item bg-gray-50 p-4 rounded-md border border-gray-200';
+        div.id = `task-${task.id}`;
 
         const timezoneMetadata = getForecastTimezoneMetadata(task);
         const createdAt = task.created_at
@@ -1356,10 +1459,11 @@ document.addEventListener('DOMContentLoaded', () => {
             if (response.ok) {
                 showNotification('success', isEditing ? 'Task updated successfully.' : 'Task created successfully.');
                 resetForm();
-                await loadTasks();
                 if (data?.task?.id) {
-                    taskCache.set(data.task.id, data.task);
+                    upsertTask(data.task);
                     updateTaskSummaryDisplay(data.task.id, data);
+                } else {
+                    await loadTasks();
                 }
                 showNotification('success', wasEditing ? 'Task updated successfully.' : 'Task created successfully.');
             } else {
@@ -1414,12 +1518,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 method: 'DELETE',
             });
             if (response.ok) {
-                if (editingTaskId === taskId) {
-                    resetForm();
-                }
-                summaryCache.delete(taskId);
-                taskCache.delete(taskId);
-                await loadTasks();
+                removeTask(taskId);
                 showNotification('success', 'Task deleted successfully.');
             } else {
                 showNotification('error', 'Error deleting task.');
@@ -1563,12 +1662,27 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         renderWindowsLoading(windowsDiv);
         try {
+            const headers = { 'Content-Type': 'application/json' };
+            const knownEtag = summaryCache.has(taskId) ? suggestionEtags.get(taskId) : undefined;
+            if (knownEtag) {
+                headers['If-None-Match'] = knownEtag;
+            }
             const response = await fetch('/suggestions/', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers,
                 body: JSON.stringify({ task_id: taskId }),
             });
+            if (response.status === 304) {
+                renderWindowSummary(windowsDiv, summaryCache.get(taskId));
+                return;
+            }
             if (response.ok) {
+                const etag = response.headers.get('ETag');
+                if (etag) {
+                    suggestionEtags.set(taskId, etag);
+                } else {
+                    suggestionEtags.delete(taskId);
+                }
 
                 let data = null;
                 try {
@@ -1589,4 +1703,5 @@ document.addEventListener('DOMContentLoaded', () => {
 
     resetForm();
     void loadTasks();
+    subscribeToTaskEvents();
 });
@@ -0,0 +1,263 @@
+"""Resilient GET requests to OpenWeather: retries, backoff and hedging.
+
+Transient failures (connection errors, timeouts and the statuses in
+``RetryPolicy.retry_statuses``) are retried with full-jitter exponential
+backoff, waiting at least as long as a ``Retry-After`` header asks. With
+hedging enabled, an attempt that has not answered by the observed p95
+latency gets a second identical request and whichever answers first wins;
+the slower request is left to finish in the background and its response is
+closed. ``RetryPolicy.timeout`` bounds the whole call, attempts and backoff
+included: each attempt only gets the time that is left.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+import random
+import threading
+import time
+from typing import Deque, FrozenSet, List, Optional
+
+import requests
+
+from . import metrics
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() not in ("", "0", "false", "no")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # Overall budget for one ``get`` call across every attempt and wait.
+    timeout: float = 10.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+    hedge: bool = False
+    # Hedging only starts once enough latencies were seen for a useful p95.
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=max(1, int(os.environ.get("FORECAST_RETRY_ATTEMPTS", "3"))),
+            base_delay=float(os.environ.get("FORECAST_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.environ.get("FORECAST_RETRY_MAX_DELAY", "8")),
+            timeout=float(os.environ.get("FORECAST_REQUEST_TIMEOUT", "10")),
+            hedge=_env_flag("FORECAST_HEDGE", "0"),
+        )
+
+
+class LatencyTracker:
+    """Sliding window of recent upstream response times."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(fraction * len(samples)))
+        return samples[index]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+latencies = LatencyTracker()
+policy = RetryPolicy.from_env()
+
+# Indirection so tests can skip real waiting.
+_sleep = time.sleep
+_monotonic = time.monotonic
+
+# Floor for an attempt's timeout when the budget is all but spent; requests
+# rejects a zero timeout.
+_MIN_ATTEMPT_TIMEOUT = 0.05
+_random = random.Random()
+
+# Hedged calls in flight at once. Each holds up to two pool threads until
+# both of its requests have finished, so the pool is sized to never queue
+# an attempt behind another call's; calls beyond the limit run unhedged on
+# the caller's thread instead of waiting for a slot.
+HEDGE_MAX_CONCURRENCY = max(1, int(os.environ.get("FORECAST_HEDGE_MAX_CONCURRENCY", "16")))
+_hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_CONCURRENCY)
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * HEDGE_MAX_CONCURRENCY, thread_name_prefix="upstream"
+                )
+    return _hedge_executor
+
+
+def _release_slot_after(futures: "List[Future[requests.Response]]") -> None:
+    """Return the hedge slot once every request of the call has finished."""
+    if not futures:
+        _hedge_slots.release()
+        return
+    outstanding = [len(futures)]
+    lock = threading.Lock()
+
+    def _done(_: "Future[requests.Response]") -> None:
+        with lock:
+            outstanding[0] -= 1
+            last = outstanding[0] == 0
+        if last:
+            _hedge_slots.release()
+
+    for future in futures:
+        future.add_done_callback(_done)
+
+
+def backoff_delay(attempt: int, retry_policy: RetryPolicy) -> float:
+    """Full-jitter delay before retry number ``attempt`` (starting at 1)."""
+    ceiling = min(retry_policy.max_delay, retry_policy.base_delay * (2 ** (attempt - 1)))
+    return _random.uniform(0, ceiling)
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse ``Retry-After`` as delta-seconds or an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _timed_get(url: str, timeout: float) -> requests.Response:
+    started = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=timeout)
+    except requests.RequestException:
+        metrics.registry.increment("upstream.attempt_errors")
+        raise
+    elapsed = time.perf_counter() - started
+    latencies.record(elapsed)
+    metrics.registry.observe("upstream.attempt_seconds", elapsed)
+    metrics.registry.increment(f"upstream.status.{response.status_code}")
+    return response
+
+
+def _close_response(future: "Future[requests.Response]") -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _hedged_get(url: str, timeout: float, hedge_after: float) -> requests.Response:
+    """Run one attempt with a hedge; the caller holds a ``_hedge_slots`` slot."""
+    executor = _get_hedge_executor()
+    started = _monotonic()
+    futures: "List[Future[requests.Response]]" = []
+    try:
+        primary = executor.submit(_timed_get, url, timeout)
+        futures.append(primary)
+        done, _ = wait([primary], timeout=hedge_after)
+        remaining = timeout - (_monotonic() - started)
+        if done or remaining <= 0:
+            return primary.result()
+
+        metrics.registry.increment("upstream.hedges")
+        hedge = executor.submit(_timed_get, url, remaining)
+        futures.append(hedge)
+        pending = {primary, hedge}
+        failure: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is hedge:
+                        metrics.registry.increment("upstream.hedge_wins")
+                    for loser in pending:
+                        # Release the losing connection whenever it finishes.
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                failure = error
+        assert failure is not None
+        raise failure
+    finally:
+        _release_slot_after(futures)
+
+
+def _attempt(url: str, retry_policy: RetryPolicy, timeout: float) -> requests.Response:
+    metrics.registry.increment("upstream.attempts")
+    if retry_policy.hedge:
+        hedge_after = latencies.percentile(0.95, retry_policy.hedge_min_samples)
+        if hedge_after is not None and hedge_after < timeout:
+            if _hedge_slots.acquire(blocking=False):
+                return _hedged_get(url, timeout, hedge_after)
+            metrics.registry.increment("upstream.hedges_shed")
+    return _timed_get(url, timeout)
+
+
+def get(url: str, retry_policy: Optional[RetryPolicy] = None) -> requests.Response:
+    """GET ``url`` under ``retry_policy`` (the module ``policy`` by default).
+
+    Returns the last response received, which may still carry an error
+    status once retries or the ``timeout`` budget are exhausted or the
+    status is not retryable.
+    Raises the last ``requests.RequestException`` if no attempt got a
+    response at all.
+    """
+    retry_policy = retry_policy or policy
+    deadline = _monotonic() + retry_policy.timeout
+    attempt = 1
+    while True:
+        try:
+            response = _attempt(url, retry_policy, max(_MIN_ATTEMPT_TIMEOUT, deadline - _monotonic()))
+        except requests.RequestException:
+            if attempt >= retry_policy.max_attempts:
+                raise
+            delay = backoff_delay(attempt, retry_policy)
+            if delay >= deadline - _monotonic():
+                metrics.registry.increment("upstream.deadline_exceeded")
+                raise
+        else:
+            if response.status_code not in retry_policy.retry_statuses:
+                return response
+            if attempt >= retry_policy.max_attempts:
+                return response
+            delay = backoff_delay(attempt, retry_policy)
+            requested = retry_after_seconds(response)
+            if requested is not None:
+                if requested > retry_policy.max_delay:
+                    # Waiting that long would stall the caller; report the
+                    # rate limit instead.
+                    return response
+                delay = max(delay, requested)
+            if delay >= deadline - _monotonic():
+                metrics.registry.increment("upstream.deadline_exceeded")
+                return response
+        metrics.registry.increment("upstream.retries")
+        metrics.registry.observe("upstream.backoff_seconds", delay)
+        _sleep(delay)
+        attempt += 1
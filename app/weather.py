@@ -1,10 +1,36 @@
 
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, replace
+import hashlib
+import json
 import os
-from typing import Dict, List, Tuple
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
 
 import requests
 
+from . import metrics, shared_cache, upstream, zip_clusters
+
+# How long a fetched forecast is reused before OpenWeather is contacted again.
+# OpenWeather refreshes its 3-hour forecast far less often than this.
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get("FORECAST_CACHE_TTL_SECONDS", "600"))
+# Upper bound on the memory held by cached forecasts in one process; the
+# least recently read forecasts are dropped beyond it.
+FORECAST_CACHE_MAX_BYTES = int(os.environ.get("FORECAST_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Shared forecast files are pruned at most this often per process; files not
+# rewritten for the five-day forecast horizon hold only past blocks.
+SHARED_PRUNE_INTERVAL_SECONDS = 60.0
+_FORECAST_HORIZON_SECONDS = 5 * 86400
+
+
+def _now() -> float:
+    return time.time()
+
 
 class WeatherServiceError(Exception):
     """Raised when the weather service cannot return a valid forecast."""
@@ -45,20 +71,405 @@ def _normalize_zip(zip_code: str) -> str:
     return f"{digits},{country}"
 
 
+def location_key_for(location: Optional[str]) -> Optional[str]:
+    """Return the normalized ZIP used to group tasks sharing a forecast."""
+    try:
+        return _normalize_zip(location or "")
+    except ValueError:
+        return None
+
+
+def _forecast_key(zip_code: str) -> str:
+    """Return the cache key for a ZIP: itself, or its shared cluster cell."""
+    normalized = _normalize_zip(zip_code)
+    try:
+        return zip_clusters.forecast_key(normalized)
+    except RuntimeError as exc:
+        # The centroid table became unreadable after the startup check.
+        raise WeatherServiceError(str(exc), status_code=503) from exc
+
+
+def _first_upcoming_block(blocks: List[Dict[str, float]], now: float) -> int:
+    """Index of the first block that has not started by ``now``.
+
+    Windows start on a block boundary, so a block already in progress would
+    schedule a task up to three hours in the past.
+    """
+    if not blocks or blocks[0]["dt"] >= now:
+        return 0
+    return bisect_left([block["dt"] for block in blocks], now)
+
+
+@dataclass(frozen=True)
+class _CachedForecast:
+    blocks: List[Dict[str, float]]
+    timezone_offset: int
+    version: str
+    fetched_at: float
+    # Per-block content hashes aligned with ``blocks``, and the diff against
+    # the forecast this one replaced (``None`` when there was none).
+    block_hashes: List[str] = field(default_factory=list)
+    delta: Optional[Dict[str, object]] = None
+
+    def without_started_blocks(self, now: float) -> "_CachedForecast":
+        """Drop blocks that have started by ``now``.
+
+        The trimmed entry gets its own version, with a delta from this one
+        listing the dropped blocks, so ETags and sweeps see the change.
+        """
+        start = _first_upcoming_block(self.blocks, now)
+        if start == 0:
+            return self
+        blocks = self.blocks[start:]
+        return replace(
+            self,
+            blocks=blocks,
+            block_hashes=self.block_hashes[start:],
+            version=forecast_version(blocks, self.timezone_offset),
+            delta={
+                "previous_version": self.version,
+                "changed": [],
+                "removed": [block["dt"] for block in self.blocks[:start]],
+                "offset_changed": False,
+            },
+        )
+
+    def estimated_bytes(self) -> int:
+        size = sys.getsizeof(self.blocks) + sys.getsizeof(self.block_hashes)
+        for block in self.blocks:
+            size += sys.getsizeof(block) + sum(sys.getsizeof(value) for value in block.values())
+        size += sum(sys.getsizeof(digest) for digest in self.block_hashes)
+        if self.delta:
+            size += len(json.dumps(self.delta))
+        return size
+
+
+@dataclass(frozen=True)
+class ForecastDelta:
+    """Blocks that differ between two consecutive forecasts for a ZIP code.
+
+    ``changed`` holds the timestamps of blocks whose values changed or that
+    are new (including blocks appended at the tail); ``removed`` those that
+    disappeared, typically started blocks at the head. A task whose window
+    ends before :meth:`earliest_change` and contains no removed block does
+    not need recomputing.
+    """
+
+    previous_version: str
+    version: str
+    changed: Tuple[int, ...]
+    removed: Tuple[int, ...]
+    offset_changed: bool
+
+    def earliest_change(self) -> Optional[int]:
+        return min(self.changed) if self.changed else None
+
+
+def _block_hash(block: Dict[str, float]) -> str:
+    content = f"{block.get('temp')!r}|{block.get('rain')!r}|{block.get('humidity')!r}"
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _diff_forecasts(
+    previous: _CachedForecast,
+    blocks: List[Dict[str, float]],
+    block_hashes: List[str],
+    timezone_offset: int,
+) -> Dict[str, object]:
+    previous_hashes = previous.block_hashes or [_block_hash(block) for block in previous.blocks]
+    before = {block["dt"]: digest for block, digest in zip(previous.blocks, previous_hashes)}
+    current = {block["dt"] for block in blocks}
+    return {
+        "previous_version": previous.version,
+        "changed": [
+            block["dt"] for block, digest in zip(blocks, block_hashes) if before.get(block["dt"]) != digest
+        ],
+        "removed": [dt for dt in before if dt not in current],
+        "offset_changed": previous.timezone_offset != timezone_offset,
+    }
+
+
+class _RetentionBudget:
+    """Byte accounting for cached forecasts, least recently read first."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+
+    def touch(self, key: str) -> None:
+        if key in self._sizes:
+            self._sizes.move_to_end(key)
+
+    def add(self, key: str, size: int) -> List[str]:
+        """Account ``size`` bytes for ``key``; return the keys to evict."""
+        self.discard(key)
+        self._sizes[key] = size
+        self.total += size
+        evicted = []
+        # The newest entry is always kept, even if it alone exceeds the budget.
+        while self.total > self.max_bytes and len(self._sizes) > 1:
+            oldest, oldest_size = self._sizes.popitem(last=False)
+            self.total -= oldest_size
+            evicted.append(oldest)
+        if evicted:
+            metrics.registry.increment("forecast_cache.evictions", len(evicted))
+        self._report()
+        return evicted
+
+    def discard(self, key: str) -> None:
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self.total -= size
+            self._report()
+
+    def clear(self) -> None:
+        self._sizes.clear()
+        self.total = 0
+        self._report()
+
+    def _report(self) -> None:
+        metrics.registry.set_gauge("forecast_cache.bytes", self.total)
+        metrics.registry.set_gauge("forecast_cache.entries", len(self._sizes))
+
+
+class _MemoryForecastBackend:
+    """Per-process forecast cache; the default for single-worker deployments."""
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        self._entries: Dict[str, _CachedForecast] = {}
+        self._lock = threading.Lock()
+        self._fetch_locks = shared_cache.KeyedLocks()
+        self._budget = _RetentionBudget(FORECAST_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+    def get(self, key: str) -> Optional[_CachedForecast]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._budget.touch(key)
+            trimmed = entry.without_started_blocks(_now())
+            if trimmed is not entry:
+                self._store(key, trimmed)
+            return trimmed
+
+    def set(self, key: str, entry: _CachedForecast) -> None:
+        with self._lock:
+            self._store(key, entry)
+
+    def _store(self, key: str, entry: _CachedForecast) -> None:
+        self._entries[key] = entry
+        for evicted in self._budget.add(key, entry.estimated_bytes()):
+            self._entries.pop(evicted, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._budget.clear()
+
+    def fetch_lock(self, key: str):
+        return self._fetch_locks.hold(key)
+
+
+class _SharedForecastBackend:
+    """Forecast cache shared by every worker process on the host."""
+
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None) -> None:
+        self._store = shared_cache.SharedJSONStore(directory / "forecasts")
+        self._converted: Dict[str, Tuple[object, _CachedForecast]] = {}
+        self._lock = threading.Lock()
+        # Bounds the decoded copies this process keeps. The files themselves
+        # are held to the same byte budget by ``_prune``.
+        self._budget = _RetentionBudget(FORECAST_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+        self._last_prune = time.monotonic()
+
+    def get(self, key: str) -> Optional[_CachedForecast]:
+        raw = self._store.read(key)
+        if not isinstance(raw, dict):
+            return None
+        now = _now()
+        with self._lock:
+            converted = self._converted.get(key)
+            if converted is not None and converted[0] is raw:
+                entry = converted[1]
+                self._budget.touch(key)
+                trimmed = entry.without_started_blocks(now)
+                if trimmed is not entry:
+                    self._retain(key, raw, trimmed)
+                return trimmed
+            try:
+                entry = _CachedForecast(**raw).without_started_blocks(now)
+            except TypeError:
+                return None
+            self._retain(key, raw, entry)
+            return entry
+
+    def _retain(self, key: str, raw: object, entry: _CachedForecast) -> None:
+        self._converted[key] = (raw, entry)
+        for evicted in self._budget.add(key, entry.estimated_bytes()):
+            self._converted.pop(evicted, None)
+            self._store.forget(evicted)
+
+    def set(self, key: str, entry: _CachedForecast) -> None:
+        self._store.write(key, asdict(entry))
+        now = time.monotonic()
+        if now - self._last_prune >= SHARED_PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            self._prune()
+
+    def _prune(self) -> None:
+        removed = self._store.prune(max_bytes=self._budget.max_bytes, max_age=_FORECAST_HORIZON_SECONDS)
+        if removed:
+            metrics.registry.increment("forecast_cache.shared_evictions", removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._converted.clear()
+            self._budget.clear()
+        self._store.clear()
+
+    def fetch_lock(self, key: str):
+        return self._store.lock(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                directory = shared_cache.shared_cache_dir()
+                _backend = (
+                    _SharedForecastBackend(directory)
+                    if directory is not None
+                    else _MemoryForecastBackend()
+                )
+    return _backend
+
+
+def configure_forecast_cache(directory: Optional[Path]) -> None:
+    """Select the shared backend for ``directory``, or in-process when ``None``."""
+    global _backend
+    with _backend_lock:
+        _backend = (
+            _SharedForecastBackend(Path(directory))
+            if directory is not None
+            else _MemoryForecastBackend()
+        )
+
+
+def forecast_version(forecast: List[Dict[str, float]], timezone_offset: int) -> str:
+    """Return a content hash identifying a forecast payload.
+
+    Identical forecasts hash identically, so the version is stable across
+    refetches and processes and only moves when the data actually changes.
+    """
+    encoded = json.dumps([timezone_offset, forecast], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _get_fresh_entry(key: str) -> Optional[_CachedForecast]:
+    entry = _get_backend().get(key)
+    if entry is None or _now() - entry.fetched_at >= FORECAST_CACHE_TTL_SECONDS:
+        return None
+    return entry
+
+
+def get_cached_forecast_version(zip_code: str) -> Optional[str]:
+    """Return the version of a still-fresh cached forecast without fetching."""
+    try:
+        key = _forecast_key(zip_code)
+    except (ValueError, WeatherServiceError):
+        return None
+    entry = _get_fresh_entry(key)
+    return entry.version if entry else None
+
+
+def clear_forecast_cache() -> None:
+    _get_backend().clear()
+
+
 def fetch_hourly_forecast(zip_code: str) -> Tuple[List[Dict[str, float]], int]:
     """Fetch the next five days of hourly weather for a ZIP code.
 
     Returns a tuple of ``(hourly blocks, location timezone offset)`` where the
-    timezone offset is expressed in seconds from UTC.
+    timezone offset is expressed in seconds from UTC. Forecasts are reused for
+    ``FORECAST_CACHE_TTL_SECONDS`` per normalized ZIP code (or per shared
+    cell when ZIP clustering is enabled), and concurrent misses for the same
+    key (across threads, or across workers when
+    ``SHARED_CACHE_DIR`` is set) wait for a single upstream request.
     """
-    normalized = _normalize_zip(zip_code)
+    key = _forecast_key(zip_code)
+    entry = _get_fresh_entry(key)
+    if entry is None:
+        backend = _get_backend()
+        with backend.fetch_lock(key):
+            entry = _get_fresh_entry(key)
+            if entry is None:
+                results, timezone_offset = _request_forecast(key, zip_code)
+                results = results[_first_upcoming_block(results, _now()):]
+                entry = _build_entry(backend.get(key), results, timezone_offset)
+                backend.set(key, entry)
+    return entry.blocks, entry.timezone_offset
+
+
+def _build_entry(
+    previous: Optional[_CachedForecast],
+    blocks: List[Dict[str, float]],
+    timezone_offset: int,
+) -> _CachedForecast:
+    version = forecast_version(blocks, timezone_offset)
+    block_hashes = [_block_hash(block) for block in blocks]
+    if previous is None:
+        delta = None
+    elif previous.version == version:
+        # Unchanged content: keep describing the last real change so callers
+        # that processed the older version can still use it.
+        delta = previous.delta
+    else:
+        delta = _diff_forecasts(previous, blocks, block_hashes, timezone_offset)
+    return _CachedForecast(
+        blocks=blocks,
+        timezone_offset=timezone_offset,
+        version=version,
+        fetched_at=_now(),
+        block_hashes=block_hashes,
+        delta=delta,
+    )
+
+
+def get_forecast_delta(zip_code: str) -> Optional[ForecastDelta]:
+    """Return how the cached forecast for ``zip_code`` differs from its predecessor."""
+    try:
+        key = _forecast_key(zip_code)
+    except (ValueError, WeatherServiceError):
+        return None
+    entry = _get_backend().get(key)
+    if entry is None or entry.delta is None:
+        return None
+    delta = entry.delta
+    return ForecastDelta(
+        previous_version=str(delta["previous_version"]),
+        version=entry.version,
+        changed=tuple(delta["changed"]),
+        removed=tuple(delta["removed"]),
+        offset_changed=bool(delta["offset_changed"]),
+    )
+
+
+def _request_forecast(
+    key: str, zip_code: str
+) -> Tuple[List[Dict[str, float]], int]:
     api_key = _get_api_key()
     url = (
         "https://api.openweathermap.org/data/2.5/forecast?"
-        f"zip={normalized}&appid={api_key}&units=imperial"
+        f"{zip_clusters.upstream_query(key)}&appid={api_key}&units=imperial"
     )
     try:
-        resp = requests.get(url, timeout=10)
+        resp = upstream.get(url)
     except requests.RequestException as exc:
 
         raise WeatherServiceError(
@@ -0,0 +1,164 @@
+"""Optional sharing of forecasts between nearby ZIP codes.
+
+Neighboring ZIP codes receive practically the same OpenWeather forecast.
+With ``ZIP_CLUSTER_RADIUS_KM`` set, each ZIP found in the centroid table is
+mapped onto a square grid whose cells fit inside a circle of that radius,
+and all ZIPs in a cell share one forecast fetched for the cell's center
+coordinates. ZIPs missing from the table keep their own per-ZIP forecast.
+
+The table is a CSV with ``zip,lat,lon`` columns read from
+``ZIP_CENTROIDS_PATH`` (default ``app/data/zip_centroids.csv``) on first use;
+an unreadable table raises ``RuntimeError`` while clustering is enabled.
+The application calls :func:`check_table` at startup so a bad path stops it
+there instead of failing requests.
+"""
+import csv
+import math
+import os
+from pathlib import Path
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from . import metrics
+
+ZIP_CLUSTER_RADIUS_KM = float(os.environ.get("ZIP_CLUSTER_RADIUS_KM", "0"))
+ZIP_CENTROIDS_PATH = Path(
+    os.environ.get(
+        "ZIP_CENTROIDS_PATH",
+        str(Path(__file__).resolve().parent / "data" / "zip_centroids.csv"),
+    )
+)
+
+_KM_PER_DEGREE_LAT = 111.32
+CELL_PREFIX = "cell:"
+
+Coordinates = Tuple[float, float]
+
+
+class ClusterIndex:
+    """Grid index from ZIP centroids to shared forecast cells."""
+
+    def __init__(self, centroids: Dict[str, Coordinates], radius_km: float) -> None:
+        # A square inscribed in the radius circle keeps every member of a
+        # cell within ``radius_km`` of the cell center.
+        self.radius_km = radius_km
+        self._side_km = radius_km * math.sqrt(2)
+        self._cell_of: Dict[str, str] = {}
+        self._centers: Dict[str, Coordinates] = {}
+        self._members: Dict[str, List[str]] = {}
+        for zip5, (lat, lon) in centroids.items():
+            key, center = self._cell(lat, lon)
+            self._cell_of[zip5] = key
+            self._centers[key] = center
+            self._members.setdefault(key, []).append(zip5)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[str, Coordinates]:
+        lat_step = self._side_km / _KM_PER_DEGREE_LAT
+        row = math.floor(lat / lat_step)
+        center_lat = (row + 0.5) * lat_step
+        # Longitude degrees shrink with latitude; size columns per row at the
+        # row edge nearer the equator, where a degree is widest, so no corner
+        # of the cell ends up beyond the radius.
+        edge_lat = min(abs(row * lat_step), abs((row + 1) * lat_step))
+        km_per_degree_lon = _KM_PER_DEGREE_LAT * max(math.cos(math.radians(edge_lat)), 0.01)
+        lon_step = self._side_km / km_per_degree_lon
+        col = math.floor(lon / lon_step)
+        center = (round(center_lat, 4), round((col + 0.5) * lon_step, 4))
+        return f"{CELL_PREFIX}{self.radius_km:g}:{row}:{col}", center
+
+    def cell_for(self, zip5: str) -> Optional[str]:
+        return self._cell_of.get(zip5)
+
+    def center(self, cell_key: str) -> Optional[Coordinates]:
+        return self._centers.get(cell_key)
+
+    def members(self, cell_key: str) -> List[str]:
+        return list(self._members.get(cell_key, ()))
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+
+def load_centroids(path: Path) -> Dict[str, Coordinates]:
+    """Read ``zip,lat,lon`` rows, skipping malformed ones."""
+    centroids: Dict[str, Coordinates] = {}
+    with open(path, newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            try:
+                zip5 = (row.get("zip") or "").strip().zfill(5)
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if len(zip5) == 5 and zip5.isdigit():
+                centroids[zip5] = (lat, lon)
+    return centroids
+
+
+_index: Optional[ClusterIndex] = None
+_index_lock = threading.Lock()
+
+
+def _get_index() -> Optional[ClusterIndex]:
+    global _index
+    if ZIP_CLUSTER_RADIUS_KM <= 0:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    centroids = load_centroids(ZIP_CENTROIDS_PATH)
+                except OSError as exc:
+                    # Silently falling back to per-ZIP forecasts would hide a
+                    # misconfiguration; leave the index unset so a fixed
+                    # table is picked up on the next call.
+                    raise RuntimeError(
+                        f"ZIP_CLUSTER_RADIUS_KM is {ZIP_CLUSTER_RADIUS_KM:g} but the ZIP centroid "
+                        f"table at {ZIP_CENTROIDS_PATH} could not be read: {exc}. Set "
+                        "ZIP_CENTROIDS_PATH or disable clustering with ZIP_CLUSTER_RADIUS_KM=0."
+                    ) from exc
+                _index = ClusterIndex(centroids, ZIP_CLUSTER_RADIUS_KM)
+                metrics.registry.set_gauge("zip_clusters.zips", len(_index))
+    return _index
+
+
+def check_table() -> None:
+    """Load the centroid table now; raises ``RuntimeError`` if it is unreadable."""
+    _get_index()
+
+
+def configure(radius_km: float, centroids: Optional[Dict[str, Coordinates]] = None) -> None:
+    """Set the cluster radius, optionally with an in-memory centroid table.
+
+    Without ``centroids`` the table is (re)loaded lazily from
+    ``ZIP_CENTROIDS_PATH``; a radius of ``0`` disables clustering.
+    """
+    global ZIP_CLUSTER_RADIUS_KM, _index
+    with _index_lock:
+        ZIP_CLUSTER_RADIUS_KM = radius_km
+        _index = ClusterIndex(centroids, radius_km) if centroids is not None and radius_km > 0 else None
+
+
+def forecast_key(normalized: str) -> str:
+    """Map a normalized ``digits,COUNTRY`` ZIP to the key its forecast is cached under."""
+    index = _get_index()
+    if index is None:
+        return normalized
+    digits, _, country = normalized.partition(",")
+    if country != "US":
+        return normalized
+    cell = index.cell_for(digits[:5])
+    if cell is None:
+        metrics.registry.increment("zip_clusters.unmapped")
+        return normalized
+    return cell
+
+
+def upstream_query(key: str) -> str:
+    """Return the OpenWeather location query for a forecast cache key."""
+    if key.startswith(CELL_PREFIX):
+        index = _get_index()
+        center = index.center(key) if index is not None else None
+        if center is None:
+            raise ValueError(f"Unknown forecast cell '{key}'.")
+        return f"lat={center[0]}&lon={center[1]}"
+    return f"zip={key}"
@@ -0,0 +1,64 @@
+"""Measure cold-start cost of the application.
+
+Each sample runs in a fresh interpreter so module caches from earlier
+samples do not hide import work. Reports the median time to import
+``app.main`` and to serve the first request through the ASGI app.
+"""
+import argparse
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+_IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start)
+"""
+
+_FIRST_REQUEST_SNIPPET = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+with TestClient(app.main.app) as client:
+    client.get("/tasks/")
+print(time.perf_counter() - start)
+"""
+
+
+def _sample(snippet: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="samples per measurement")
+    args = parser.parse_args()
+
+    for label, snippet in (
+        ("import app.main", _IMPORT_SNIPPET),
+        ("import + lifespan + first request", _FIRST_REQUEST_SNIPPET),
+    ):
+        timings = _sample(snippet, args.runs)
+        print(
+            f"{label}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"min {min(timings) * 1000:.1f} ms over {args.runs} runs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,11 @@
 from pathlib import Path
 import sys
 
-from sqlalchemy import create_engine
-
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from app.models import Base
-
-DATABASE_URL = "sqlite:///./test.db"
+from app import database
 
 
 def init_db() -> None:
@@ -20,8 +16,7 @@ def init_db() -> None:
     if not db_path.parent.exists():
         db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-    Base.metadata.create_all(bind=engine)
+    database.init_schema()
     print(f"Database initialized at {db_path.resolve()}")
 
 
@@ -118,3 +118,28 @@ def test_suggestions_endpoint_respects_timezone(monkeypatch):
     assert first_window["display"] == "8/31 11 PM - 9/1 2 AM"
     assert body["reason_summary"] is None
     assert {"reason": "start before earliest allowed (02:00)", "count": 1} in body["reason_details"]
+
+
+def test_index_page_reuses_asset_metadata(monkeypatch):
+    from app import main as main_module
+
+    main_module._asset_checked_at = None
+    first = client.get("/")
+    assert first.status_code == 200
+    assert "static/js/main.js" in first.text
+
+    def _fail_stat(self, *args, **kwargs):
+        raise AssertionError("asset metadata should be cached")
+
+    monkeypatch.setattr(main_module.Path, "stat", _fail_stat)
+    assert client.get("/").status_code == 200
+
+
+def test_lifespan_creates_schema_once(monkeypatch):
+    from app import database
+
+    models.Base.metadata.drop_all(bind=engine)
+    monkeypatch.setattr(database, "_schema_ready", False)
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/tasks/").status_code == 200
+    assert database._schema_ready
@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import batch
+from app.find_windows import find_windows
+
+
+BASE_TS = 1_700_000_000
+BLOCK_SECONDS = 3 * 3600
+
+
+def _forecast(rain_every: int):
+    return [
+        {
+            'dt': BASE_TS + index * BLOCK_SECONDS,
+            'temp': 60.0 + index,
+            'rain': 1.0 if index % rain_every == 0 else 0.0,
+            'humidity': 40 + index,
+        }
+        for index in range(24)
+    ]
+
+
+def _task(task_id: int, **overrides):
+    fields = dict(
+        id=task_id,
+        min_temp=None,
+        max_temp=None,
+        min_humidity=None,
+        max_humidity=None,
+        no_rain=True,
+        duration_hours=3 + (task_id % 3) * 3,
+        earliest_start=None,
+        latest_start='18:00' if task_id % 2 else None,
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def _expected(task, forecast, offset):
+    return find_windows(
+        forecast=forecast,
+        min_temp=task.min_temp,
+        max_temp=task.max_temp,
+        min_humidity=task.min_humidity,
+        max_humidity=task.max_humidity,
+        no_rain=task.no_rain,
+        duration_hours=task.duration_hours,
+        earliest_start=task.earliest_start,
+        latest_start=task.latest_start,
+        timezone_offset=offset,
+    )
+
+
+def _scenario():
+    forecasts = {'12345,US': (_forecast(4), -18_000), '94107,US': (_forecast(5), -25_200)}
+    tasks = [_task(task_id, min_temp=60.0 + task_id % 7) for task_id in range(1, 21)]
+    units = [
+        batch.WorkUnit.from_task(task, '12345,US' if task.id % 2 else '94107,US')
+        for task in tasks
+    ]
+    expected = {
+        unit.task_id: _expected(task, *forecasts[unit.forecast_key])
+        for unit, task in zip(units, tasks)
+    }
+    return units, forecasts, expected
+
+
+def test_inline_batch_matches_find_windows():
+    units, forecasts, expected = _scenario()
+    assert batch.compute_windows_batch(units, forecasts, max_workers=1) == expected
+
+
+def test_process_pool_batch_matches_find_windows():
+    units, forecasts, expected = _scenario()
+    try:
+        results = batch.compute_windows_batch(units, forecasts, max_workers=2, chunk_size=3)
+    finally:
+        batch.shutdown_pool()
+    assert results == expected
+
+
+def test_empty_batch_does_not_start_workers():
+    assert batch.compute_windows_batch([], {}, max_workers=4) == {}
+    assert batch._executors == {}
+
+
+class _BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise batch.BrokenProcessPool("worker died")
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_and_retried_once():
+    units, forecasts, expected = _scenario()
+    broken = _BrokenExecutor()
+    batch._executors[2] = broken
+    try:
+        results = batch.compute_windows_batch(units, forecasts, max_workers=2, chunk_size=3)
+        assert batch._executors[2] is not broken
+    finally:
+        batch.shutdown_pool()
+    assert broken.shut_down
+    assert results == expected
@@ -0,0 +1,145 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import crud, http_cache, models, weather
+from app import main as main_module
+from app.main import app, engine, SessionLocal
+
+
+client = TestClient(app)
+
+BASE_TS = 1_693_526_400  # 2023-09-01 00:00:00 UTC
+FORECAST = [
+    {"dt": BASE_TS, "temp": 70.0, "rain": 0.0, "humidity": 40},
+    {"dt": BASE_TS + 10_800, "temp": 72.0, "rain": 0.0, "humidity": 42},
+]
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    # Pin the clock to the fixture forecast so its blocks are not trimmed as started.
+    monkeypatch.setattr(weather, "_now", lambda: BASE_TS)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    weather.clear_forecast_cache()
+    http_cache.response_cache.clear()
+    yield
+    weather.clear_forecast_cache()
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+def _insert_task(**overrides):
+    fields = dict(
+        name="Mow lawn",
+        duration_hours=3,
+        no_rain=True,
+        location="12345",
+        created_at=datetime.utcnow(),
+    )
+    fields.update(overrides)
+    with SessionLocal() as session:
+        task = models.Task(**fields)
+        session.add(task)
+        session.commit()
+        session.refresh(task)
+    crud._bump_table_version()
+    return task.id
+
+
+def test_task_list_revalidates_until_a_mutation(monkeypatch):
+    _insert_task()
+    first = client.get("/tasks/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert len(first.json()) == 1
+
+    monkeypatch.setattr(crud, "get_tasks", lambda db: pytest.fail("DB should not be read"))
+    assert client.get("/tasks/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/tasks/").content == first.content
+    monkeypatch.undo()
+
+    _insert_task(name="Wash car")
+    refreshed = client.get("/tasks/", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert len(refreshed.json()) == 2
+
+
+def test_single_task_etag_and_missing_task():
+    task_id = _insert_task()
+    first = client.get(f"/tasks/{task_id}")
+    assert first.json()["id"] == task_id
+    repeat = client.get(f"/tasks/{task_id}", headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+    assert client.get("/tasks/999").status_code == 404
+
+
+def test_suggestions_answer_304_without_db_or_window_engine(monkeypatch):
+    monkeypatch.setattr(
+        weather, "_request_forecast", lambda normalized, zip_code: (list(FORECAST), 0)
+    )
+    task_id = _insert_task()
+
+    first = client.post("/suggestions/", json={"task_id": task_id})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    monkeypatch.setattr(crud, "get_task", lambda db, task_id: pytest.fail("DB should not be read"))
+    monkeypatch.setattr(
+        main_module.find_windows, "find_windows", lambda **kwargs: pytest.fail("no recompute")
+    )
+    repeat = client.post(
+        "/suggestions/", json={"task_id": task_id}, headers={"If-None-Match": etag}
+    )
+    assert repeat.status_code == 304
+    assert repeat.headers["etag"] == etag
+    cached = client.post("/suggestions/", json={"task_id": task_id})
+    assert cached.content == first.content
+
+
+def test_suggestion_etag_changes_with_forecast(monkeypatch):
+    blocks = list(FORECAST)
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: (blocks, 0))
+    task_id = _insert_task()
+    etag = client.post("/suggestions/", json={"task_id": task_id}).headers["etag"]
+
+    weather.clear_forecast_cache()
+    blocks = [dict(FORECAST[0], rain=1.0), FORECAST[1]]
+    changed = client.post(
+        "/suggestions/", json={"task_id": task_id}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["possible_windows"][0]["start_ts"] == FORECAST[1]["dt"]
+
+
+def test_etag_matching_handles_lists_and_weak_tags():
+    assert http_cache.etag_matches('"a", W/"b"', '"b"')
+    assert http_cache.etag_matches("*", '"z"')
+    assert not http_cache.etag_matches(None, '"z"')
+    assert not http_cache.etag_matches('"a"', '"b"')
+
+
+def test_response_cache_evicts_to_its_byte_budget():
+    cache = http_cache.LRUCache(max_entries=16, max_bytes=10)
+    cache.set("a", b"xxxx")
+    cache.set("b", b"yyyy")
+    cache.get("a")
+    cache.set("c", b"zzzz")
+    cache.set("huge", b"h" * 11)
+
+    assert cache.get("b") is None and cache.get("huge") is None
+    assert (cache.get("a"), cache.get("c")) == (b"xxxx", b"zzzz")
+    assert cache.bytes == 8
+    cache.set("a", b"x")
+    assert cache.bytes == 5
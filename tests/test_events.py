@@ -0,0 +1,163 @@
+import asyncio
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import crud, events, models
+from app.main import app, engine
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    yield
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+async def _collect(subscription, count, timeout=1.0):
+    frames = []
+    stream = subscription.stream(keepalive=timeout)
+    async for frame in stream:
+        frames.append(frame)
+        if len(frames) >= count:
+            break
+    await stream.aclose()
+    return frames
+
+
+def test_events_published_from_other_threads_reach_subscriber():
+    broker = events.TaskEventBroker()
+
+    async def scenario():
+        subscription = broker.subscribe()
+        publisher = threading.Thread(
+            target=broker.publish, args=(events.TASK_DELETED, {"id": 7})
+        )
+        publisher.start()
+        publisher.join()
+        frames = await _collect(subscription, 2)
+        subscription.close()
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert frames[0].startswith(b"retry:")
+    assert frames[1] == f'id: {broker.epoch}-1\nevent: task.deleted\ndata: {{"id":7}}\n\n'.encode()
+    assert broker.subscriber_count == 0
+
+
+def test_reconnect_replays_missed_events_or_requests_resync():
+    broker = events.TaskEventBroker(history_size=2)
+    for task_id in range(3):
+        broker.publish(events.TASK_DELETED, {"id": task_id})
+
+    async def scenario(last_event_id):
+        subscription = broker.subscribe(last_event_id)
+        frames = await _collect(subscription, 2)
+        subscription.close()
+        return frames[1]
+
+    assert asyncio.run(scenario(broker.format_id(2))).startswith(
+        f"id: {broker.epoch}-3\nevent: task.deleted".encode()
+    )
+    assert b"event: resync" in asyncio.run(scenario(broker.format_id(0)))
+    # Ids handed out by another worker or process lifetime cannot be resumed.
+    assert b"event: resync" in asyncio.run(scenario("0123abcd-2"))
+    assert b"event: resync" in asyncio.run(scenario("2"))
+
+
+def test_workers_sharing_a_log_deliver_every_event_under_one_id(tmp_path):
+    from app import shared_cache
+
+    log_path = tmp_path / "events" / "tasks.log"
+    worker_a = events.TaskEventBroker(log=shared_cache.SharedEventLog(log_path))
+    worker_b = events.TaskEventBroker(log=shared_cache.SharedEventLog(log_path))
+    assert worker_a.epoch == worker_b.epoch
+
+    async def scenario():
+        on_b = worker_b.subscribe()
+        worker_a.publish(events.TASK_DELETED, {"id": 1})
+        worker_b.poll_shared_log()
+        first = await _collect(on_b, 2)
+        on_b.close()
+        # Reconnect to worker A with the id worker B delivered.
+        worker_a.publish(events.TASK_DELETED, {"id": 2})
+        resumed = worker_a.subscribe(worker_b.format_id(1))
+        second = await _collect(resumed, 2)
+        resumed.close()
+        return first[1], second[1]
+
+    first, second = asyncio.run(scenario())
+    assert first.startswith(f"id: {worker_a.epoch}-1\nevent: task.deleted".encode())
+    assert second.startswith(f"id: {worker_a.epoch}-2\nevent: task.deleted".encode())
+
+
+def test_events_lost_to_log_rotation_trigger_resync(tmp_path):
+    from app import shared_cache
+
+    log_path = tmp_path / "events" / "tasks.log"
+    broker = events.TaskEventBroker(log=shared_cache.SharedEventLog(log_path, max_bytes=100))
+    other_worker = shared_cache.SharedEventLog(log_path, max_bytes=100)
+
+    async def scenario():
+        subscription = broker.subscribe()
+        broker.publish(events.TASK_DELETED, {"id": 0})
+        # Several rotations happen before this worker looks at the log again.
+        for task_id in range(1, 8):
+            other_worker.append({"type": events.TASK_DELETED, "data": {"id": task_id}})
+        broker.poll_shared_log()
+        frames = await _collect(subscription, 2)
+        subscription.close()
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert frames[1].startswith(f"id: {broker.epoch}-8\nevent: resync".encode())
+
+
+def test_slow_subscriber_is_told_to_resync():
+    broker = events.TaskEventBroker(max_queue=1)
+
+    async def scenario():
+        subscription = broker.subscribe()
+        for task_id in range(3):
+            broker.publish(events.TASK_DELETED, {"id": task_id})
+        await asyncio.sleep(0)
+        frames = await _collect(subscription, 2)
+        subscription.close()
+        return frames[1]
+
+    assert b"event: resync" in asyncio.run(scenario())
+
+
+def test_task_mutations_publish_deltas(monkeypatch):
+    forecast = [{"dt": 1_693_526_400, "temp": 70.0, "rain": 0.0, "humidity": 40}]
+    monkeypatch.setattr(crud.weather, "fetch_hourly_forecast", lambda zip_code: (forecast, 0))
+    published = []
+    monkeypatch.setattr(
+        events.broker, "publish", lambda event_type, data: published.append((event_type, data))
+    )
+
+    payload = {"name": "Paint fence", "duration_hours": 3, "location": "12345"}
+    task_id = client.post("/tasks/", json=payload).json()["task"]["id"]
+    client.put(f"/tasks/{task_id}", json={**payload, "name": "Paint shed"})
+    client.delete(f"/tasks/{task_id}")
+
+    assert [event_type for event_type, _ in published] == [
+        events.TASK_CREATED,
+        events.TASK_UPDATED,
+        events.TASK_DELETED,
+    ]
+    assert published[1][1]["task"]["name"] == "Paint shed"
+    assert published[2][1] == {"id": task_id}
@@ -76,3 +76,113 @@ def test_window_returned_when_post_duration_block_has_gap():
         detail['reason'] == 'forecast horizon ended before reaching required duration'
         for detail in result['reason_details']
     )
+
+
+def test_local_minutes_table_matches_gmtime_for_all_offsets():
+    import time
+
+    from app.find_windows import _format_minute_of_day, local_minutes_table
+
+    forecast = [make_block(index) for index in range(16)]
+    for offset in (-43_200, -34_200, -3_600, 0, 19_800, 20_700, 50_400):
+        table = local_minutes_table(forecast, offset)
+        assert local_minutes_table(forecast, offset) is table
+        for block, minute in zip(forecast, table):
+            local = time.gmtime(block['dt'] + offset)
+            assert _format_minute_of_day(minute) == f'{local.tm_hour:02d}:{local.tm_min:02d}'
+
+
+def test_local_minutes_table_is_keyed_by_content_not_identity():
+    from app import find_windows
+
+    forecast = [make_block(index) for index in range(16)]
+    table = find_windows.local_minutes_table(forecast, 0)
+
+    assert find_windows.local_minutes_table([dict(block) for block in forecast], 0) is table
+    assert find_windows.local_minutes_table(forecast[1:], 0) == table[1:]
+    assert all(isinstance(value, list) and all(isinstance(m, int) for m in value)
+               for value in find_windows._local_tables.values())
+
+
+def test_gapped_forecasts_with_matching_sums_get_their_own_tables():
+    midnight = BASE_TS - BASE_TS % 86_400
+    first = [make_block(0, dt=midnight + hours * 3600) for hours in (0, 3, 12)]
+    second = [make_block(0, dt=midnight + hours * 3600) for hours in (0, 6, 9)]
+
+    constraints = dict(
+        min_temp=None, max_temp=None, min_humidity=None, max_humidity=None,
+        no_rain=True, duration_hours=3, earliest_start='05:00',
+    )
+    find_windows(forecast=first, **constraints)
+    result = find_windows(forecast=second, **constraints)
+
+    assert [window['start_ts'] for window in result['windows']] == [
+        second[1]['dt'], second[2]['dt']
+    ]
+
+
+def test_time_bounds_keep_failure_reason_text():
+    forecast = [make_block(index) for index in range(8)]
+
+    result = find_windows(
+        forecast=forecast,
+        min_temp=None,
+        max_temp=None,
+        min_humidity=None,
+        max_humidity=None,
+        no_rain=False,
+        duration_hours=3,
+        earliest_start='00:00',
+        latest_start='12:00',
+        timezone_offset=-18_000,
+    )
+
+    reasons = {detail['reason'] for detail in result['reason_details']}
+    assert reasons == {
+        'start after latest allowed (14:13)',
+        'start after latest allowed (17:13)',
+        'start after latest allowed (20:13)',
+        'start after latest allowed (23:13)',
+    }
+    assert [window['display'] for window in result['windows']][:2] == [
+        '11/15 2 AM - 5 AM',
+        '11/15 5 AM - 8 AM',
+    ]
+
+
+def test_compiled_constraints_keep_only_active_checks_and_are_cached():
+    from types import SimpleNamespace
+
+    from app.find_windows import compile_task
+
+    task = SimpleNamespace(
+        min_temp=None,
+        max_temp=75.0,
+        min_humidity=None,
+        max_humidity=None,
+        no_rain=False,
+        duration_hours=3,
+        earliest_start='06:00',
+        latest_start=None,
+    )
+    compiled = compile_task(task)
+
+    assert len(compiled.checks) == 2
+    assert compiled.earliest == 360 and compiled.latest is None
+    assert compile_task(SimpleNamespace(**vars(task))) is compiled
+    assert compiled.block_failure(make_block(0, temp=80.0)) == (
+        'temperature above maximum (80F > 75F)'
+    )
+    assert compiled.block_failure(make_block(0, rain=2.0)) is None
+    assert compiled.start_failure(300) == 'start before earliest allowed (05:00)'
+
+
+def test_compiled_constraints_distinguish_int_and_float_bounds():
+    from app.find_windows import compile_constraints
+
+    as_int = compile_constraints((None, None, 60, None, True, 3, None, None))
+    as_float = compile_constraints((None, None, 60.0, None, True, 3, None, None))
+
+    assert as_int is not as_float
+    assert as_int.block_failure(make_block(0, humidity=50)) == 'humidity below minimum (50% < 60%)'
+    assert as_float.block_failure(make_block(0, humidity=50)) == 'humidity below minimum (50% < 60.0%)'
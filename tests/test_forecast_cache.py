@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import metrics, weather
+
+
+BASE_TS = 1_693_526_400  # 2023-09-01 00:00:00 UTC
+
+
+def _blocks(count=8):
+    return [
+        {"dt": BASE_TS + index * 10_800, "temp": 70.0, "rain": 0.0, "humidity": 40}
+        for index in range(count)
+    ]
+
+
+def _entry(blocks):
+    return weather._build_entry(None, blocks, 0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": BASE_TS}
+    monkeypatch.setattr(weather, "_now", lambda: now["value"])
+    return now
+
+
+def test_reads_drop_blocks_that_have_started(clock, monkeypatch):
+    monkeypatch.setattr(weather, "_request_forecast", lambda key, zip_code: (_blocks(), 0))
+    monkeypatch.setattr(weather, "FORECAST_CACHE_TTL_SECONDS", 86_400)
+    weather.clear_forecast_cache()
+    try:
+        first, _ = weather.fetch_hourly_forecast("12345")
+        first_version = weather.get_cached_forecast_version("12345")
+        clock["value"] = BASE_TS + 2 * 10_800 + 60  # the third block has started
+        trimmed, _ = weather.fetch_hourly_forecast("12345")
+        again, _ = weather.fetch_hourly_forecast("12345")
+        trimmed_version = weather.get_cached_forecast_version("12345")
+        delta = weather.get_forecast_delta("12345")
+    finally:
+        weather.clear_forecast_cache()
+
+    assert len(first) == 8
+    assert [block["dt"] for block in trimmed] == [BASE_TS + index * 10_800 for index in range(3, 8)]
+    # Repeat reads within the same block return the same list object.
+    assert again is trimmed
+    # The trimmed entry is versioned by its own content and chains to the
+    # untrimmed one through its delta.
+    assert trimmed_version == weather.forecast_version(trimmed, 0) != first_version
+    assert (delta.previous_version, delta.version) == (first_version, trimmed_version)
+    assert delta.removed == (BASE_TS, BASE_TS + 10_800, BASE_TS + 2 * 10_800) and delta.changed == ()
+
+
+def test_fetch_locks_are_dropped_once_released(clock, monkeypatch, tmp_path):
+    from app import shared_cache
+
+    monkeypatch.setattr(weather, "_request_forecast", lambda key, zip_code: (_blocks(), 0))
+    try:
+        for directory in (None, tmp_path):
+            weather.configure_forecast_cache(directory)
+            for zip_code in ("12345", "23456", "34567"):
+                weather.fetch_hourly_forecast(zip_code)
+            if directory is None:
+                assert len(weather._get_backend()._fetch_locks) == 0
+            assert len(shared_cache._thread_locks) == 0
+    finally:
+        weather.clear_forecast_cache()
+        weather.configure_forecast_cache(None)
+
+
+def test_memory_budget_evicts_least_recently_read(clock):
+    size = _entry(_blocks()).estimated_bytes()
+    backend = weather._MemoryForecastBackend(max_bytes=int(size * 2.5))
+    evictions = metrics.registry.counter("forecast_cache.evictions")
+
+    backend.set("a", _entry(_blocks()))
+    backend.set("b", _entry(_blocks()))
+    assert backend.get("a") is not None
+    backend.set("c", _entry(_blocks()))
+
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+    assert metrics.registry.counter("forecast_cache.evictions") - evictions == 1
+    assert metrics.registry.snapshot()["gauges"]["forecast_cache.bytes"] == pytest.approx(2 * size)
+
+
+def test_shared_backend_bounds_decoded_copies_only(clock, tmp_path):
+    size = _entry(_blocks()).estimated_bytes()
+    backend = weather._SharedForecastBackend(tmp_path, max_bytes=int(size * 1.5))
+
+    backend.set("a", _entry(_blocks()))
+    backend.set("b", _entry(_blocks()))
+    backend.get("a")
+    backend.get("b")
+
+    assert list(backend._converted) == ["b"]
+    assert backend.get("a").blocks == _blocks()
@@ -0,0 +1,266 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from datetime import datetime, timedelta
+
+from app import crud, jobs, models, scheduling, schemas
+from app.main import app, engine, SessionLocal
+
+
+BASE_TS = 1_693_526_400  # 2023-09-01 00:00:00 UTC
+FORECAST = [
+    {"dt": BASE_TS + index * 10_800, "temp": 70.0, "rain": 0.0, "humidity": 40} for index in range(8)
+]
+
+
+@pytest.fixture(autouse=True)
+def clean_database(monkeypatch):
+    scheduling.reset_swept_versions()
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(crud.weather, "fetch_hourly_forecast", lambda zip_code: (FORECAST, 0))
+    yield
+    jobs.manager.stop()
+    # Pooled SQLite connections opened by job threads can keep a stale schema
+    # cache across the drop/create below; start later tests with fresh ones.
+    engine.dispose()
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+def _wait_for(client, job_id, states=jobs.FINISHED_STATES, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get(f"/jobs/{job_id}").json()
+        if body["status"] in states or time.monotonic() > deadline:
+            return body
+        time.sleep(0.01)
+
+
+def test_reschedule_job_runs_in_background_and_reports_counts():
+    with SessionLocal() as db:
+        for name, location in (("Mow", "12345"), ("Rake", "12345"), ("Paint", "94107")):
+            crud.create_task(db, schemas.TaskCreate(name=name, duration_hours=3, location=location))
+
+    with TestClient(app) as client:
+        response = client.post("/jobs/reschedule")
+        assert response.status_code == 202
+        body = _wait_for(client, response.json()["id"])
+
+    assert body["status"] == jobs.SUCCEEDED
+    assert (body["total"], body["processed"], body["unchanged"], body["errors"]) == (3, 3, 3, [])
+    assert body["started_at"] is not None and body["finished_at"] is not None
+
+
+def test_running_job_can_be_cancelled(monkeypatch):
+    started = threading.Event()
+
+    def _slow_sweep(db, *, progress=None, should_cancel=None):
+        started.set()
+        while not should_cancel():
+            time.sleep(0.01)
+        return scheduling.SweepResult(cancelled=True)
+
+    monkeypatch.setattr(scheduling, "reschedule_all", _slow_sweep)
+    with TestClient(app) as client:
+        job_id = client.post("/jobs/reschedule").json()["id"]
+        assert started.wait(5)
+        queued_id = client.post("/jobs/reschedule").json()["id"]
+
+        assert client.post(f"/jobs/{queued_id}/cancel").json()["status"] == jobs.CANCELLED
+        assert client.post(f"/jobs/{job_id}/cancel").json()["cancel_requested"] is True
+        body = _wait_for(client, job_id)
+
+    assert body["status"] == jobs.CANCELLED
+    assert client.get("/jobs/999").status_code == 404
+
+
+def test_full_queue_rejects_new_jobs(monkeypatch):
+    release = threading.Event()
+
+    def _blocking_runner(job_id, should_cancel):
+        release.wait(5)
+        return jobs.SUCCEEDED
+
+    monkeypatch.setattr(jobs, "_RUNNERS", {jobs.RESCHEDULE: _blocking_runner})
+    manager = jobs.JobManager(queue_size=1, concurrency=1)
+    try:
+        first = manager.submit(jobs.RESCHEDULE)
+        with SessionLocal() as db:
+            deadline = time.monotonic() + 5
+            while jobs.get_job(db, first.id).status != jobs.RUNNING and time.monotonic() < deadline:
+                db.expire_all()
+                time.sleep(0.01)
+        manager.submit(jobs.RESCHEDULE)
+        with pytest.raises(jobs.JobQueueFull):
+            manager.submit(jobs.RESCHEDULE)
+    finally:
+        release.set()
+        manager.stop()
+    with SessionLocal() as db:
+        assert db.query(models.Job).count() == 2
+
+
+def test_polls_succeed_while_a_large_sweep_runs():
+    with SessionLocal() as db:
+        db.execute(
+            models.Task.__table__.insert(),
+            [
+                {
+                    "name": f"Task {index}",
+                    "duration_hours": 3,
+                    "no_rain": True,
+                    "location": f"{10000 + index % 300:05d}",
+                    "location_key": f"{10000 + index % 300:05d},US",
+                    "created_at": datetime.utcnow(),
+                }
+                for index in range(3000)
+            ],
+        )
+        db.commit()
+
+    statuses = []
+    with TestClient(app) as client:
+        job_id = client.post("/jobs/reschedule").json()["id"]
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            response = client.get(f"/jobs/{job_id}")
+            statuses.append(response.status_code)
+            if response.status_code != 200 or response.json()["status"] in jobs.FINISHED_STATES:
+                break
+        body = response.json()
+
+    assert set(statuses) == {200}
+    assert body["status"] == jobs.SUCCEEDED, body["errors"]
+    assert (body["processed"], body["rescheduled"]) == (3000, 3000)
+
+
+def _add_job(db, status, worker, kind=jobs.RESCHEDULE, heartbeat_at=None):
+    job = models.Job(
+        kind=kind,
+        status=status,
+        created_at=heartbeat_at or datetime.utcnow(),
+        heartbeat_at=heartbeat_at,
+        errors="[]",
+        worker=worker,
+    )
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_startup_fails_jobs_whose_lease_expired():
+    expired = datetime.utcnow() - timedelta(seconds=2 * jobs.JOB_LEASE_SECONDS)
+    with SessionLocal() as db:
+        # A restarted container's worker may even reuse the old pid.
+        same_pid = _add_job(db, jobs.RUNNING, jobs.WORKER_ID.rsplit(":", 1)[0] + ":old", heartbeat_at=expired)
+        queued = _add_job(db, jobs.QUEUED, None, heartbeat_at=expired)
+        live = _add_job(db, jobs.RUNNING, "elsewhere:1:live")
+        done = _add_job(db, jobs.SUCCEEDED, None, heartbeat_at=expired)
+
+    with TestClient(app) as client:
+        statuses = {
+            job_id: client.get(f"/jobs/{job_id}").json() for job_id in (same_pid, queued, live, done)
+        }
+
+    assert [statuses[job_id]["status"] for job_id in (same_pid, queued)] == [jobs.FAILED] * 2
+    assert statuses[same_pid]["errors"] == [jobs.ORPHANED_MESSAGE]
+    assert statuses[same_pid]["finished_at"] is not None
+    assert statuses[live]["status"] == jobs.RUNNING
+    assert statuses[done]["status"] == jobs.SUCCEEDED
+
+
+def test_expired_running_job_does_not_block_new_claims(monkeypatch):
+    ran = threading.Event()
+
+    def _runner(job_id, should_cancel):
+        ran.set()
+        return jobs.SUCCEEDED
+
+    monkeypatch.setattr(jobs, "_RUNNERS", {jobs.RESCHEDULE: _runner})
+    expired = datetime.utcnow() - timedelta(seconds=2 * jobs.JOB_LEASE_SECONDS)
+    with SessionLocal() as db:
+        stuck = _add_job(db, jobs.RUNNING, "elsewhere:1:gone", heartbeat_at=expired)
+    manager = jobs.JobManager(queue_size=2, concurrency=1)
+    try:
+        manager.submit(jobs.RESCHEDULE)
+        assert ran.wait(5)
+    finally:
+        manager.stop()
+    with SessionLocal() as db:
+        assert jobs.get_job(db, stuck).status == jobs.FAILED
+
+
+def test_heartbeat_renews_leases_of_own_jobs(monkeypatch):
+    release = threading.Event()
+
+    def _runner(job_id, should_cancel):
+        release.wait(5)
+        return jobs.SUCCEEDED
+
+    monkeypatch.setattr(jobs, "_RUNNERS", {jobs.RESCHEDULE: _runner})
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.01)
+    manager = jobs.JobManager(queue_size=2, concurrency=1)
+    try:
+        job = manager.submit(jobs.RESCHEDULE)
+        with SessionLocal() as db:
+            first = jobs.get_job(db, job.id).heartbeat_at
+            deadline = time.monotonic() + 5
+            while jobs.get_job(db, job.id).heartbeat_at == first and time.monotonic() < deadline:
+                db.expire_all()
+                time.sleep(0.01)
+            assert jobs.get_job(db, job.id).heartbeat_at > first
+    finally:
+        release.set()
+        manager.stop()
+
+
+def test_job_waits_while_another_worker_runs_the_same_kind(monkeypatch):
+    ran = threading.Event()
+
+    def _runner(job_id, should_cancel):
+        ran.set()
+        return jobs.SUCCEEDED
+
+    monkeypatch.setattr(jobs, "_RUNNERS", {jobs.RESCHEDULE: _runner})
+    monkeypatch.setattr(jobs, "JOB_CLAIM_RETRY_SECONDS", 0.01)
+    with SessionLocal() as db:
+        elsewhere = _add_job(db, jobs.RUNNING, "elsewhere:1")
+    manager = jobs.JobManager(queue_size=2, concurrency=1)
+    try:
+        job = manager.submit(jobs.RESCHEDULE)
+        assert not ran.wait(0.2)
+        with SessionLocal() as db:
+            assert jobs.get_job(db, job.id).status == jobs.QUEUED
+            db.get(models.Job, elsewhere).status = jobs.SUCCEEDED
+            db.commit()
+        assert ran.wait(5)
+    finally:
+        manager.stop()
+    with SessionLocal() as db:
+        assert jobs.get_job(db, job.id).status == jobs.SUCCEEDED
+
+
+def test_waiting_job_can_be_cancelled(monkeypatch):
+    monkeypatch.setattr(jobs, "_RUNNERS", {jobs.RESCHEDULE: lambda job_id, should_cancel: pytest.fail("ran")})
+    monkeypatch.setattr(jobs, "JOB_CLAIM_RETRY_SECONDS", 0.01)
+    with SessionLocal() as db:
+        _add_job(db, jobs.RUNNING, "elsewhere:1")
+    manager = jobs.JobManager(queue_size=2, concurrency=1)
+    try:
+        job = manager.submit(jobs.RESCHEDULE)
+        assert manager.cancel(job.id).status == jobs.CANCELLED
+    finally:
+        manager.stop()
+    with SessionLocal() as db:
+        assert jobs.get_job(db, job.id).status == jobs.CANCELLED
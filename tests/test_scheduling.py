@@ -0,0 +1,344 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import inspect
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import crud, models, scheduling, schemas, weather
+from app.main import engine, SessionLocal
+
+
+BASE_TS = 1_693_526_400  # 2023-09-01 00:00:00 UTC
+
+
+def _forecast(rainy_blocks=()):
+    return [
+        {"dt": BASE_TS + index * 10_800, "temp": 70.0, "rain": 1.0 if index in rainy_blocks else 0.0, "humidity": 40}
+        for index in range(8)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    scheduling.reset_swept_versions()
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    yield
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def forecasts(monkeypatch):
+    by_zip = {"12345,US": _forecast(), "94107,US": _forecast()}
+    calls = []
+
+    def _fake_fetch(zip_code):
+        calls.append(zip_code)
+        return by_zip[weather.location_key_for(zip_code)], 0
+
+    monkeypatch.setattr(crud.weather, "fetch_hourly_forecast", _fake_fetch)
+    return by_zip, calls
+
+
+def _create(db, name, location):
+    payload = schemas.TaskCreate(name=name, duration_hours=3, location=location)
+    return crud.create_task(db, payload).task.id
+
+
+def test_scheduling_indexes_exist():
+    indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("tasks")}
+    assert indexes["ix_tasks_location"] == ["location"]
+    assert indexes["ix_tasks_scheduled_time"] == ["scheduled_time"]
+    assert indexes["ix_tasks_location_key_id"] == ["location_key", "id"]
+
+
+def test_zip_variants_share_a_location_group(forecasts):
+    with SessionLocal() as db:
+        first = _create(db, "Mow", "12345")
+        second = _create(db, "Rake", " 12345, us ")
+        third = _create(db, "Paint", "94107")
+
+        groups = [(key, [row.id for row in rows]) for key, rows in crud.iter_task_groups(db)]
+        at_location = [row.id for row in crud.get_tasks_at_location(db, "12345,US")]
+        before = crud.get_tasks_scheduled_before(db, datetime.utcfromtimestamp(BASE_TS + 1))
+
+    assert groups == [("12345,US", [first, second]), ("94107,US", [third])]
+    assert at_location == [first, second]
+    assert [row.id for row in before] == [first, second, third]
+
+
+def test_group_scan_holds_no_cursor_between_groups(forecasts):
+    by_zip, _ = forecasts
+    by_zip["60601,US"] = _forecast()
+    with SessionLocal() as db:
+        for index in range(5):
+            _create(db, f"Task {index}", "12345" if index < 3 else "94107")
+
+    groups = []
+    with SessionLocal() as db:
+        for key, rows in crud.iter_task_groups(db, batch_size=2):
+            groups.append((key, len(rows)))
+            # A write from another connection must not wait on the scan.
+            with SessionLocal() as writer:
+                _create(writer, f"Added during {key}", "60601")
+
+    assert groups == [("12345,US", 3), ("94107,US", 2)]
+
+
+def test_sweep_fetches_one_forecast_per_group_and_moves_schedules(forecasts):
+    by_zip, calls = forecasts
+    with SessionLocal() as db:
+        moved = _create(db, "Mow", "12345")
+        also_moved = _create(db, "Rake", "12345,us")
+        kept = _create(db, "Paint", "94107")
+    calls.clear()
+    by_zip["12345,US"][0]["rain"] = 2.0
+
+    with SessionLocal() as db:
+        result = scheduling.reschedule_all(db, max_workers=1)
+    with SessionLocal() as db:
+        scheduled = {task.id: task.scheduled_time for task in crud.get_tasks(db)}
+
+    assert calls == ["12345,US", "94107,US"]
+    assert (result.groups, result.tasks, result.rescheduled, result.unchanged) == (2, 3, 2, 1)
+    assert scheduled[moved] == scheduled[also_moved] == datetime.utcfromtimestamp(BASE_TS + 10_800)
+    assert scheduled[kept] == datetime.utcfromtimestamp(BASE_TS)
+
+
+def test_upgrade_adds_location_key_to_existing_tables(tmp_path):
+    from sqlalchemy import create_engine, text
+
+    from app import database
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as conn:
+        conn.execute(text("CREATE TABLE tasks (id INTEGER PRIMARY KEY, name VARCHAR, duration_hours INTEGER, "
+                          "min_temp FLOAT, max_temp FLOAT, min_humidity INTEGER, max_humidity INTEGER, "
+                          "no_rain BOOLEAN, location VARCHAR, created_at DATETIME, scheduled_time DATETIME, "
+                          "earliest_start VARCHAR, latest_start VARCHAR)"))
+        conn.execute(text("INSERT INTO tasks (id, name, location) VALUES (1, 'Old', '12345, us'), (2, 'Bad', 'n/a')"))
+
+    database._upgrade_tasks_table(legacy)
+
+    with legacy.connect() as conn:
+        keys = conn.execute(text("SELECT id, location_key FROM tasks ORDER BY id")).all()
+    assert keys == [(1, "12345,US"), (2, None)]
+    assert "ix_tasks_location_key_id" in {index["name"] for index in inspect(legacy).get_indexes("tasks")}
+
+
+def test_scheduled_time_writer_batches_updates(forecasts, monkeypatch):
+    from sqlalchemy import event
+
+    from app import events, metrics
+
+    with SessionLocal() as db:
+        task_ids = [_create(db, f"Task {index}", "12345") for index in range(5)]
+        original = {task.id: task.scheduled_time for task in crud.get_tasks(db)}
+    published = []
+    monkeypatch.setattr(events, "publish_task_scheduled", lambda task_id, value: published.append(task_id))
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            statements.append(executemany)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    flushes_before = metrics.registry.counter("scheduled_writer.flushes")
+    new_time = datetime.utcfromtimestamp(BASE_TS + 21_600)
+    try:
+        with SessionLocal() as db:
+            with crud.ScheduledTimeWriter(db, batch_size=3) as writer:
+                for task_id in task_ids:
+                    writer.add(task_id, new_time, original[task_id])
+                assert writer.pending == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert statements == [True, True]
+    assert (writer.flushes, writer.rows_written) == (2, 5)
+    assert metrics.registry.counter("scheduled_writer.flushes") - flushes_before == 2
+    assert published == task_ids
+    with SessionLocal() as db:
+        assert {task.scheduled_time for task in crud.get_tasks(db)} == {new_time}
+
+
+def test_scheduled_time_writer_rolls_back_failed_flush(forecasts, monkeypatch):
+    with SessionLocal() as db:
+        task_id = _create(db, "Mow", "12345")
+        original = crud.get_task(db, task_id).scheduled_time
+        writer = crud.ScheduledTimeWriter(db, batch_size=None)
+        writer.add(task_id, datetime.utcfromtimestamp(BASE_TS + 21_600), original)
+
+        def _failing_commit():
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(db, "commit", _failing_commit)
+        with pytest.raises(RuntimeError):
+            writer.flush()
+        assert writer.pending == 1
+    with SessionLocal() as db:
+        assert crud.get_task(db, task_id).scheduled_time == original
+
+
+def test_scheduled_time_writer_skips_deleted_and_edited_tasks(forecasts, monkeypatch):
+    from app import events
+
+    with SessionLocal() as db:
+        kept, deleted, edited = (_create(db, name, "12345") for name in ("Mow", "Paint", "Wash"))
+        original = {task.id: task.scheduled_time for task in crud.get_tasks(db)}
+    published = []
+    monkeypatch.setattr(events, "publish_task_scheduled", lambda task_id, value: published.append(task_id))
+    new_time = datetime.utcfromtimestamp(BASE_TS + 21_600)
+    edited_time = datetime.utcfromtimestamp(BASE_TS + 32_400)
+    with SessionLocal() as db:
+        writer = crud.ScheduledTimeWriter(db, batch_size=None)
+        for task_id in (kept, deleted, edited):
+            writer.add(task_id, new_time, original[task_id])
+        # Changes made by other requests after the sweep read the rows.
+        with SessionLocal() as other:
+            crud.delete_task(other, deleted)
+            crud.get_task(other, edited).scheduled_time = edited_time
+            other.commit()
+        assert writer.flush() == 1
+
+    assert (writer.rows_written, writer.rows_skipped) == (1, 2)
+    assert published == [kept]
+    with SessionLocal() as db:
+        assert crud.get_task(db, kept).scheduled_time == new_time
+        assert crud.get_task(db, deleted) is None
+        assert crud.get_task(db, edited).scheduled_time == edited_time
+
+
+def test_forecast_delta_lists_changed_removed_and_appended_blocks(monkeypatch):
+    from app import weather
+
+    appended = {"dt": BASE_TS + 8 * 10_800, "temp": 71.0, "rain": 0.0, "humidity": 40}
+    responses = [(_forecast(), 0), (_forecast(rainy_blocks=(5,))[1:] + [appended], 0)]
+    monkeypatch.setattr(weather, "_now", lambda: BASE_TS)
+    monkeypatch.setattr(weather, "FORECAST_CACHE_TTL_SECONDS", 0)
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: responses.pop(0))
+    weather.clear_forecast_cache()
+    try:
+        weather.fetch_hourly_forecast("12345")
+        assert weather.get_forecast_delta("12345") is None
+        weather.fetch_hourly_forecast("12345")
+        delta = weather.get_forecast_delta("12345")
+    finally:
+        weather.clear_forecast_cache()
+
+    assert delta.changed == (BASE_TS + 5 * 10_800, BASE_TS + 8 * 10_800)
+    assert delta.removed == (BASE_TS,)
+    assert delta.earliest_change() == BASE_TS + 5 * 10_800
+    assert not delta.offset_changed
+
+
+def test_sweep_skips_tasks_whose_window_precedes_the_change(monkeypatch):
+    from app import weather
+
+    current = {"blocks": _forecast()}
+    monkeypatch.setattr(weather, "_now", lambda: BASE_TS)
+    monkeypatch.setattr(weather, "FORECAST_CACHE_TTL_SECONDS", 0)
+    monkeypatch.setattr(
+        weather, "_request_forecast", lambda normalized, zip_code: ([dict(b) for b in current["blocks"]], 0)
+    )
+    weather.clear_forecast_cache()
+    try:
+        with SessionLocal() as db:
+            early = _create(db, "Mow", "12345")
+            late = crud.create_task(
+                db,
+                schemas.TaskCreate(name="Paint", duration_hours=3, location="12345", earliest_start="15:00"),
+            ).task.id
+            first = scheduling.reschedule_all(db, max_workers=1)
+            current["blocks"] = _forecast(rainy_blocks=(5,))
+            second = scheduling.reschedule_all(db, max_workers=1)
+            third = scheduling.reschedule_all(db, max_workers=1)
+        with SessionLocal() as db:
+            scheduled = {task.id: task.scheduled_time for task in crud.get_tasks(db)}
+    finally:
+        weather.clear_forecast_cache()
+
+    assert (first.unchanged, first.skipped) == (2, 0)
+    assert (second.skipped, second.rescheduled) == (1, 1)
+    assert (third.skipped, third.rescheduled, third.unchanged) == (2, 0, 0)
+    assert scheduled[early] == datetime.utcfromtimestamp(BASE_TS)
+    assert scheduled[late] == datetime.utcfromtimestamp(BASE_TS + 6 * 10_800)
+
+
+def test_sweep_after_head_block_starts_only_moves_tasks_that_used_it(monkeypatch):
+    from app import weather
+
+    clock = {"now": BASE_TS}
+    monkeypatch.setattr(weather, "_now", lambda: clock["now"])
+    monkeypatch.setattr(weather, "FORECAST_CACHE_TTL_SECONDS", 0)
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: (_forecast(), 0))
+    weather.clear_forecast_cache()
+    try:
+        with SessionLocal() as db:
+            early = _create(db, "Mow", "12345")
+            late = crud.create_task(
+                db,
+                schemas.TaskCreate(name="Paint", duration_hours=3, location="12345", earliest_start="15:00"),
+            ).task.id
+            scheduling.reschedule_all(db, max_workers=1)
+            clock["now"] = BASE_TS + 10_800
+            result = scheduling.reschedule_all(db, max_workers=1)
+        with SessionLocal() as db:
+            scheduled = {task.id: task.scheduled_time for task in crud.get_tasks(db)}
+    finally:
+        weather.clear_forecast_cache()
+
+    assert (result.skipped, result.rescheduled) == (1, 1)
+    assert scheduled[early] == datetime.utcfromtimestamp(BASE_TS + 10_800)
+    assert scheduled[late] == datetime.utcfromtimestamp(BASE_TS + 5 * 10_800)
+
+
+def test_block_in_progress_is_not_a_start_candidate(monkeypatch):
+    from app import weather
+
+    monkeypatch.setattr(weather, "_now", lambda: BASE_TS + 60)
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: (_forecast(), 0))
+    weather.clear_forecast_cache()
+    try:
+        with SessionLocal() as db:
+            task_id = _create(db, "Mow", "12345")
+            scheduled = crud.get_task(db, task_id).scheduled_time
+    finally:
+        weather.clear_forecast_cache()
+
+    assert scheduled == datetime.utcfromtimestamp(BASE_TS + 10_800)
+
+
+def test_sweep_follows_the_delta_of_a_cached_forecast_trimmed_on_read(monkeypatch):
+    from app import weather
+
+    clock = {"now": BASE_TS}
+    monkeypatch.setattr(weather, "_now", lambda: clock["now"])
+    monkeypatch.setattr(weather, "FORECAST_CACHE_TTL_SECONDS", 86_400)
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: (_forecast(), 0))
+    weather.clear_forecast_cache()
+    try:
+        with SessionLocal() as db:
+            _create(db, "Mow", "12345")
+            crud.create_task(
+                db,
+                schemas.TaskCreate(name="Paint", duration_hours=3, location="12345", earliest_start="15:00"),
+            )
+            scheduling.reschedule_all(db, max_workers=1)
+            swept = weather.get_cached_forecast_version("12345")
+            clock["now"] = BASE_TS + 10_800
+            result = scheduling.reschedule_all(db, max_workers=1)
+            delta = weather.get_forecast_delta("12345")
+    finally:
+        weather.clear_forecast_cache()
+
+    assert (delta.previous_version, delta.removed) == (swept, (BASE_TS,))
+    assert delta.version != swept
+    assert (result.skipped, result.rescheduled) == (1, 1)
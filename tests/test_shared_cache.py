@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import shared_cache, weather
+
+
+FORECAST = [{"dt": 1_693_526_400, "temp": 70.0, "rain": 0.0, "humidity": 40}]
+
+
+def _worker_fetch(directory: str, calls_path: str, results) -> None:
+    def _slow_request(normalized, zip_code):
+        with open(calls_path, "a") as handle:
+            handle.write(f"{os.getpid()}\n")
+        time.sleep(0.3)
+        return list(FORECAST), -14_400
+
+    weather.configure_forecast_cache(Path(directory))
+    weather._request_forecast = _slow_request
+    weather._now = lambda: FORECAST[0]["dt"]
+    results.put(weather.fetch_hourly_forecast("12345"))
+
+
+def test_workers_share_a_single_upstream_fetch(tmp_path):
+    calls_path = tmp_path / "calls.txt"
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker_fetch, args=(str(tmp_path), str(calls_path), results))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    assert len(calls_path.read_text().splitlines()) == 1
+    for _ in workers:
+        assert results.get(timeout=1) == (FORECAST, -14_400)
+
+
+def _unexpected_request(normalized, zip_code):
+    raise AssertionError("forecast should come from the shared cache")
+
+
+def test_forecast_written_by_one_backend_is_visible_to_another(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather, "_request_forecast", lambda normalized, zip_code: (FORECAST, 0))
+    monkeypatch.setattr(weather, "_now", lambda: FORECAST[0]["dt"])
+    weather.configure_forecast_cache(tmp_path)
+    try:
+        weather.fetch_hourly_forecast("12345-6789")
+        version = weather.get_cached_forecast_version("123456789")
+
+        weather.configure_forecast_cache(tmp_path)
+        monkeypatch.setattr(weather, "_request_forecast", _unexpected_request)
+        assert weather.fetch_hourly_forecast("123456789,us") == (FORECAST, 0)
+        assert weather.get_cached_forecast_version("123456789") == version
+    finally:
+        weather.configure_forecast_cache(None)
+
+
+def test_shared_counter_is_visible_across_instances(tmp_path):
+    first = shared_cache.SharedCounter(tmp_path / "tasks.version")
+    second = shared_cache.SharedCounter(tmp_path / "tasks.version")
+    before = second.value()
+
+    first.increment()
+
+    assert second.value() != before
+    assert second.value() == first.value()
+    assert second.value().endswith(".1")
+
+
+def test_event_log_readers_follow_appends_across_rotation(tmp_path):
+    path = tmp_path / "events" / "tasks.log"
+    writer = shared_cache.SharedEventLog(path, max_bytes=200)
+    reader = shared_cache.SharedEventLog(path).reader()
+
+    seen = []
+    for number in range(10):
+        writer.append({"type": "task.deleted", "data": {"id": number}})
+        if number % 2 == 0:
+            seen.extend(reader.read())
+    seen.extend(reader.read())
+    reader.close()
+
+    assert [record["seq"] for record in seen] == list(range(1, 11))
+    assert [record["data"]["id"] for record in seen] == list(range(10))
+    assert path.with_name("tasks.log.1").exists()
+    assert path.stat().st_size <= 200
+
+
+def test_store_prune_enforces_age_and_byte_budget(tmp_path):
+    store = shared_cache.SharedJSONStore(tmp_path / "forecasts")
+    for index, key in enumerate(("old", "a", "b", "c")):
+        with store.lock(key):
+            store.write(key, {"blocks": "x" * 100})
+        stamp = time.time() - (10_000 if key == "old" else 10 - index)
+        os.utime(store._path(key), (stamp, stamp))
+    with store.lock("failed"):
+        pass  # a fetch that never wrote its document
+    size = store._path("a").stat().st_size
+
+    with store.lock("a"):
+        # "a" is being refetched and skipped; "b" goes for the byte budget.
+        removed = store.prune(max_bytes=2 * size, max_age=3600)
+
+    assert removed == 2
+    assert store.read("old") is None and store.read("b") is None
+    assert store.read("a") is not None and store.read("c") is not None
+    remaining = sorted(path.name for path in store.directory.iterdir())
+    assert remaining == ["a.json", "a.lock", "c.json", "c.lock"]
+
+
+def test_shared_backend_prunes_files_to_the_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather, "SHARED_PRUNE_INTERVAL_SECONDS", 0)
+    entry = weather._build_entry(None, FORECAST, 0)
+    backend = weather._SharedForecastBackend(tmp_path, max_bytes=1)
+
+    for key in ("a", "b", "c"):
+        with backend.fetch_lock(key):
+            backend.set(key, entry)
+        time.sleep(0.01)
+
+    assert [path.name for path in (tmp_path / "forecasts").glob("*.json")] == ["c.json"]
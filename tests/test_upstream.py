@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import metrics, upstream
+
+
+URL = "https://api.openweathermap.org/data/2.5/forecast?zip=12345,US"
+
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(upstream, "_sleep", recorded.append)
+    upstream.latencies.clear()
+    metrics.registry.reset()
+    yield recorded
+    upstream.latencies.clear()
+
+
+def _scripted(monkeypatch, outcomes):
+    calls = []
+
+    def _fake_get(url, timeout):
+        calls.append(url)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(upstream.requests, "get", _fake_get)
+    return calls
+
+
+def test_retries_connection_errors_and_server_errors(monkeypatch, sleeps):
+    calls = _scripted(monkeypatch, [requests.ConnectionError("reset"), _response(503), _response(200)])
+
+    response = upstream.get(URL, upstream.RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=8))
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    assert metrics.registry.counter("upstream.attempts") == 3
+    assert metrics.registry.counter("upstream.retries") == 2
+    assert metrics.registry.counter("upstream.attempt_errors") == 1
+
+
+def test_honors_retry_after_and_gives_up_on_long_waits(monkeypatch, sleeps):
+    _scripted(monkeypatch, [_response(429, {"Retry-After": "3"}), _response(200)])
+    assert upstream.get(URL, upstream.RetryPolicy(max_delay=8)).status_code == 200
+    assert sleeps == [3.0]
+
+    _scripted(monkeypatch, [_response(429, {"Retry-After": "120"})])
+    assert upstream.get(URL, upstream.RetryPolicy(max_delay=8)).status_code == 429
+    assert sleeps == [3.0]
+
+
+def test_does_not_retry_client_errors_or_beyond_max_attempts(monkeypatch, sleeps):
+    calls = _scripted(monkeypatch, [_response(404)])
+    assert upstream.get(URL, upstream.RetryPolicy()).status_code == 404
+    assert len(calls) == 1
+
+    _scripted(monkeypatch, [requests.Timeout("slow"), requests.Timeout("slow")])
+    with pytest.raises(requests.Timeout):
+        upstream.get(URL, upstream.RetryPolicy(max_attempts=2))
+
+
+def test_timeout_bounds_the_whole_call_across_attempts(monkeypatch):
+    clock = [0.0]
+    timeouts = []
+    sleeps = []
+
+    def _fake_get(url, timeout):
+        # A struggling upstream: each attempt fails after up to 4 s.
+        timeouts.append(timeout)
+        clock[0] += min(timeout, 4.0)
+        raise requests.Timeout("no answer")
+
+    def _sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(upstream.requests, "get", _fake_get)
+    monkeypatch.setattr(upstream, "_sleep", _sleep)
+    monkeypatch.setattr(upstream, "_monotonic", lambda: clock[0])
+    metrics.registry.reset()
+
+    with pytest.raises(requests.Timeout):
+        upstream.get(URL, upstream.RetryPolicy(max_attempts=5, base_delay=0.5, timeout=10))
+
+    assert timeouts[0] == 10
+    assert len(timeouts) >= 2 and timeouts[1] <= 10 - 4 - sleeps[0]
+    assert clock[0] <= 10
+    assert len(timeouts) == len(sleeps) + 1
+    assert metrics.registry.counter("upstream.deadline_exceeded") == 1
+
+
+def test_hedged_request_answers_before_a_stalled_primary(monkeypatch, sleeps):
+    release = threading.Event()
+    closed = threading.Event()
+    calls = []
+
+    class _TrackedResponse(requests.Response):
+        def close(self):
+            closed.set()
+
+    def _fake_get(url, timeout):
+        calls.append(url)
+        if len(calls) == 1:
+            release.wait(5)
+            stalled = _TrackedResponse()
+            stalled.status_code = 500
+            return stalled
+        return _response(200)
+
+    monkeypatch.setattr(upstream.requests, "get", _fake_get)
+    for _ in range(20):
+        upstream.latencies.record(0.01)
+    try:
+        response = upstream.get(URL, upstream.RetryPolicy(hedge=True, hedge_min_samples=20))
+    finally:
+        release.set()
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert metrics.registry.counter("upstream.hedges") == 1
+    assert metrics.registry.counter("upstream.hedge_wins") == 1
+    # The losing primary is closed once it finally answers.
+    assert closed.wait(5)
+
+
+def test_hedging_beyond_its_concurrency_runs_on_the_calling_thread(monkeypatch, sleeps):
+    threads = []
+
+    def _fake_get(url, timeout):
+        threads.append(threading.current_thread())
+        return _response(200)
+
+    monkeypatch.setattr(upstream.requests, "get", _fake_get)
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(upstream, "_hedge_slots", slots)
+    for _ in range(20):
+        upstream.latencies.record(0.01)
+    policy = upstream.RetryPolicy(hedge=True, hedge_min_samples=20)
+
+    assert upstream.get(URL, policy).status_code == 200
+    # The hedged call hands its slot back once its request has finished.
+    assert slots.acquire(timeout=5)
+    try:
+        assert upstream.get(URL, policy).status_code == 200
+    finally:
+        slots.release()
+
+    assert threads[0] is not threading.current_thread()
+    assert threads[1] is threading.current_thread()
+    assert metrics.registry.counter("upstream.hedges_shed") == 1
@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "testing-key")
+
+from app import weather, zip_clusters
+
+
+CENTROIDS = {
+    "94107": (37.7665, -122.3955),  # San Francisco, SoMa
+    "94103": (37.7725, -122.4147),  # San Francisco, Mission
+    "10001": (40.7506, -73.9972),  # New York
+}
+
+
+@pytest.fixture(autouse=True)
+def isolated_clusters():
+    radius = zip_clusters.ZIP_CLUSTER_RADIUS_KM
+    weather.clear_forecast_cache()
+    yield
+    zip_clusters.configure(radius)
+    weather.clear_forecast_cache()
+
+
+def test_load_centroids_skips_malformed_rows(tmp_path):
+    table = tmp_path / "zips.csv"
+    table.write_text("zip,lat,lon\n501,40.81,-73.04\n94107,37.77,-122.40\nabcde,1,2\n10001,north,-73\n")
+
+    assert zip_clusters.load_centroids(table) == {"00501": (40.81, -73.04), "94107": (37.77, -122.40)}
+
+
+def test_nearby_zips_share_a_cell_within_the_radius():
+    index = zip_clusters.ClusterIndex(CENTROIDS, radius_km=12)
+
+    cell = index.cell_for("94107")
+    assert cell == index.cell_for("94103")
+    assert cell != index.cell_for("10001")
+    assert sorted(index.members(cell)) == ["94103", "94107"]
+    lat, lon = index.center(cell)
+    assert abs(lat - 37.77) < 0.1 and abs(lon + 122.40) < 0.15
+
+
+def test_clustered_zips_share_one_coordinate_fetch(monkeypatch):
+    zip_clusters.configure(12, CENTROIDS)
+    queries = []
+
+    def _fake_request(key, zip_code):
+        queries.append(zip_clusters.upstream_query(key))
+        return [{"dt": 0, "temp": 70.0, "rain": 0.0, "humidity": 40}], 0
+
+    monkeypatch.setattr(weather, "_request_forecast", _fake_request)
+    weather.fetch_hourly_forecast("94107")
+    weather.fetch_hourly_forecast("94103-1234")
+    weather.fetch_hourly_forecast("10001")
+    weather.fetch_hourly_forecast("60601")
+
+    assert len(queries) == 3
+    assert queries[0].startswith("lat=37.") and "&lon=-122." in queries[0]
+    assert queries[1].startswith("lat=40.")
+    assert queries[2] == "zip=60601,US"
+
+
+def test_clustering_disabled_keeps_per_zip_keys():
+    zip_clusters.configure(0)
+
+    assert weather._forecast_key("94107") == "94107,US"
+    assert zip_clusters.upstream_query("94107,US") == "zip=94107,US"
+
+
+def test_every_cell_member_lies_within_the_radius():
+    import math
+
+    radius = 200.0
+    index = zip_clusters.ClusterIndex({}, radius_km=radius)
+    worst = 0.0
+    for lat_tenths in list(range(-650, -550)) + list(range(-20, 20)) + list(range(550, 650)):
+        for lon_tenths in range(100, 200):
+            lat, lon = lat_tenths / 10, lon_tenths / 10
+            _, (center_lat, center_lon) = index._cell(lat, lon)
+            north_km = (lat - center_lat) * 111.32
+            east_km = (lon - center_lon) * 111.32 * math.cos(math.radians(lat))
+            worst = max(worst, math.hypot(north_km, east_km))
+    assert worst <= radius * 1.001
+
+
+def test_unreadable_centroid_table_fails_loudly(monkeypatch, tmp_path):
+    monkeypatch.setattr(zip_clusters, "ZIP_CENTROIDS_PATH", tmp_path / "missing.csv")
+    zip_clusters.configure(10)
+
+    with pytest.raises(RuntimeError, match="missing.csv"):
+        zip_clusters.check_table()
+    # Requests get a 503 instead of an unhandled RuntimeError.
+    with pytest.raises(weather.WeatherServiceError, match="missing.csv") as error:
+        weather._forecast_key("94107")
+    assert error.value.status_code == 503
+    assert weather.get_cached_forecast_version("94107") is None
+
+    (tmp_path / "missing.csv").write_text("zip,lat,lon\n94107,37.7665,-122.3955\n")
+    assert weather._forecast_key("94107").startswith(zip_clusters.CELL_PREFIX)